@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, abort, current_app, request
+from sqlalchemy import select
+from werkzeug.exceptions import HTTPException
+
+from models import Artist, ArtistGenre, Genre, Show, Venue, VenueGenre, db, showListing
+from routing import readOnly
+from util import decodeCursor, encodeCursor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON API for the mobile clients, next to the HTML views. Every endpoint
+# selects only the columns it returns and serializes the rows as they come
+# back, without loading ORM objects. Responses carry a weak ETag of the body,
+# so a matching If-None-Match gets a 304, and are gzipped for clients that
+# accept it once they reach API_GZIP_MIN_SIZE bytes. Errors anywhere under
+# the prefix are {"error": <name>} with their status.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+venueColumns = (Venue.id, Venue.name, Venue.address, Venue.city, Venue.state, Venue.phone,
+                Venue.website, Venue.facebook_link, Venue.seeking_talent,
+                Venue.seeking_description, Venue.image_link)
+artistColumns = (Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+                 Artist.website, Artist.facebook_link, Artist.seeking_venue,
+                 Artist.seeking_description, Artist.image_link)
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), default=datetime.isoformat).encode()
+
+
+def respond(data, status=200):
+    body = dumps(data)
+    response = Response(body, status, mimetype='application/json')
+    if status != 200:
+        return response
+    response.set_etag(hashlib.sha1(body).hexdigest(), weak=True)
+    response.vary.add('Accept-Encoding')
+    response.make_conditional(request)
+    if response.status_code == 200 and len(body) >= current_app.config['API_GZIP_MIN_SIZE'] \
+            and request.accept_encodings.quality('gzip') > 0:
+        response.set_data(gzip.compress(body, current_app.config['API_GZIP_LEVEL']))
+        response.content_encoding = 'gzip'
+    return response
+
+
+def pageLimit():
+    limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+    return min(max(limit, 1), current_app.config['API_MAX_PAGE_SIZE'])
+
+
+def listing(model, *columns):
+    # one page of `model` in id order: ?after=<id>&limit=<n>&genre=<name>
+    limit = pageLimit()
+    query = db.session.query(*columns)
+    genre = request.args.get('genre')
+    if genre:
+        query = query.filter(model.genres.any(Genre.name == genre))
+    after = request.args.get('after', type=int)
+    if after is not None:
+        query = query.filter(model.id > after)
+    rows = query.order_by(model.id).limit(limit + 1).all()
+    return respond({
+        'data': [row._asdict() for row in rows[:limit]],
+        'next': rows[limit - 1].id if len(rows) > limit else None
+    })
+
+
+def genreNames(table, key, id):
+    return db.session.execute(
+        select(Genre.name).join(table, table.c.genre_id == Genre.id)
+        .where(table.c[key] == id).order_by(Genre.name)).scalars().all()
+
+
+def splitShows(shows):
+    now = datetime.now()
+    past, upcoming = [], []
+    for row in shows:
+        (past if row.start_time < now else upcoming).append(row._asdict())
+    return {'past_shows': past, 'upcoming_shows': upcoming}
+
+
+@api.route('/venues')
+@readOnly
+def venues():
+    return listing(Venue, Venue.id, Venue.name, Venue.city, Venue.state,
+                   Venue.upcoming_shows_count.label('num_upcoming_shows'))
+
+
+@api.route('/venues/<int:venue_id>')
+@readOnly
+def venue(venue_id):
+    venue = db.session.query(*venueColumns).filter(Venue.id == venue_id).first()
+    if venue is None:
+        abort(404)
+    shows = db.session.query(Show.artist_id, Artist.name.label('artist_name'),
+                             Artist.image_link.label('artist_image_link'), Show.start_time) \
+        .join(Artist, Show.artist_id == Artist.id) \
+        .filter(Show.venue_id == venue_id, Show.start_time != None).order_by(Show.start_time)
+    data = venue._asdict()
+    data['genres'] = genreNames(VenueGenre, 'venue_id', venue_id)
+    data.update(splitShows(shows))
+    return respond(data)
+
+
+@api.route('/artists')
+@readOnly
+def artists():
+    return listing(Artist, Artist.id, Artist.name, Artist.city, Artist.state,
+                   Artist.upcoming_shows_count.label('num_upcoming_shows'))
+
+
+@api.route('/artists/<int:artist_id>')
+@readOnly
+def artist(artist_id):
+    artist = db.session.query(*artistColumns).filter(Artist.id == artist_id).first()
+    if artist is None:
+        abort(404)
+    shows = db.session.query(Show.venue_id, Venue.name.label('venue_name'),
+                             Venue.image_link.label('venue_image_link'), Show.start_time) \
+        .join(Venue, Show.venue_id == Venue.id) \
+        .filter(Show.artist_id == artist_id, Show.start_time != None).order_by(Show.start_time)
+    data = artist._asdict()
+    data['genres'] = genreNames(ArtistGenre, 'artist_id', artist_id)
+    data.update(splitShows(shows))
+    return respond(data)
+
+
+@api.route('/shows')
+@readOnly
+def shows():
+    # same keyset pages as /shows: ?after=<cursor>&limit=<n>&upcoming=1
+    limit = pageLimit()
+    try:
+        after = decodeCursor(request.args['after']) if request.args.get('after') else None
+    except ValueError:
+        abort(400)
+    rows = showListing(request.args.get('upcoming', 0, type=int) == 1, after).limit(limit + 1).all()
+    last = rows[limit - 1] if len(rows) > limit else None
+    return respond({
+        'data': [row._asdict() for row in rows[:limit]],
+        'next': encodeCursor(last.start_time, last.id) if last else None
+    })
+
+
+def isApiRequest():
+    return request.path == api.url_prefix or request.path.startswith(api.url_prefix + '/')
+
+
+@api.app_errorhandler(HTTPException)
+def error(error):
+    # every error under /api/v1 is JSON, also for unknown paths and methods
+    # that never reach the blueprint; the others keep their default page
+    if not isApiRequest():
+        return error
+    response = respond({'error': error.name}, error.code)
+    for key, value in error.get_headers():
+        if key != 'Content-Type':
+            response.headers[key] = value
+    return response
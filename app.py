@@ -3,189 +3,428 @@
 #----------------------------------------------------------------------------#
 from email.utils import localtime
 from enum import unique
-from functools import reduce
+from functools import lru_cache, wraps
+import hmac
 import json
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, session, url_for
+import babel.dates
+import click
+from flask import Blueprint, Flask, abort, current_app, jsonify, render_template, request, Response, flash, redirect, session, stream_with_context, url_for
+from flask.cli import AppGroup
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
-from logging import Formatter, FileHandler, error
+import time
+from logging import Formatter, error
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
-from sqlalchemy import UniqueConstraint, func, true
-
-from util import createArtistEntity, createShowArtist, createShowVenue, createVenueEntity, reduceVenues
+from sqlalchemy import UniqueConstraint, case, func, inspect, or_, select, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager, joinedload
+
+from api import api, dumps, isApiRequest, respond
+from api import error as apiError
+from assets import Build, StaticAssets
+from autocomplete import Autocomplete
+from bookings import conflicts, describe, showEnd
+from bulk import Importer, existing, exportRows, formatOf, kinds, readRows, writeRows
+from cache import PageCache, conditional
+from counters import ShowCounters
+from logs import fileHandler, queueLogging
+from models import Artist, Genre, Show, Venue, db, genresByName, showListing
+from parallel import ParallelReads
+from pool import engineOptions, poolStats
+from routing import readOnly
+from search import Search
+from timing import RequestTiming
+from util import createArtistEntity, createShowArtist, createShowVenue, createVenueEntity, csvChunks, decodeCursor, encodeCursor, groupVenues, ndjsonChunks
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-# moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-# TODO: connect to a local postgresql database
+main = Blueprint('main', __name__)
+migrate = Migrate()
+pageCache = PageCache()
+requestTiming = RequestTiming()
+parallelReads = ParallelReads()
+staticAssets = StaticAssets()
+
+def create_app(config='config'):
+    # Building the app only reads the config; connections are opened on the
+    # first query and the schema is managed through migrations/.
+    app = Flask(__name__)
+    # moment = Moment(app)
+    app.config.from_object(config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engineOptions(app.config))
+    db.init_app(app)
+    migrate.init_app(app, db)
+    pageCache.init_app(app)
+    requestTiming.init_app(app)
+    parallelReads.init_app(app)
+    ownerSearch.init_app(app)
+    nameCompletion.init_app(app)
+    staticAssets.init_app(app)
+    app.jinja_env.filters['datetime'] = format_datetime
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(fyyur_cli)
+    app.cli.add_command(assets_cli)
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+
+    if not app.debug:
+        # written by a listener thread, see logs.py
+        file_handler = fileHandler(app.config)
+        file_handler.setFormatter(
+            Formatter(
+                '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        queueLogging(app, file_handler)
+        app.logger.info('errors')
+
+    return app
 
 #----------------------------------------------------------------------------#
-# Models.
+# Search.
 #----------------------------------------------------------------------------#
-class Venue(db.Model):
-    __tablename__ = 'Venue'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, unique = True, nullable=False)
-    genres = db.Column(db.String, nullable=False)
-    address = db.Column(db.String(120), nullable=False)
-    city = db.Column(db.String(120), nullable=False)
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    facebook_link = db.Column(db.String(120))
-    seeking_talent = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String)
-    image_link = db.Column(db.String(500))
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
-db.create_all()
-class Artist(db.Model):
-    __tablename__ = 'Artist'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, unique = True, nullable=False)
-    genres = db.Column(db.String(120), nullable=False)
-    city = db.Column(db.String(120), nullable=False)
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    facebook_link = db.Column(db.String(120))
-    seeking_venue = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String)
-    image_link = db.Column(db.String(500))
-
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
-
-# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
-db.create_all()
-class Show(db.Model):
-    __tablename__ = 'Show'
-
-    id = db.Column(db.Integer, primary_key=True)
-    start_time = db.Column(db.DateTime)
-
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete="cascade"),
-                         nullable=False)
-    venue = db.relationship('Venue', cascade = "all,delete", backref=db.backref('venue', lazy=True, passive_deletes=True))
-
-    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete="cascade"),
-                          nullable=False)
-    artist = db.relationship('Artist', cascade = "all,delete", backref=db.backref('artist', lazy=True, passive_deletes=True))
+
+# Postgres matches through the pg_trgm GIN indexes and ranks by similarity();
+# other databases fall back to an in-process trigram index per model.
+ownerSearch = Search(venues=(Venue, Venue.name, Venue.city, Venue.state),
+                     artists=(Artist, Artist.name, Artist.city, Artist.state))
+ownerSearch.watchCommits(db.session)
+# name prefixes for /autocomplete, on every database
+nameCompletion = Autocomplete(venues=Venue, artists=Artist)
+nameCompletion.watchCommits(db.session)
+
+def searchEntities(model, kind, search_term, page):
+    columns = (model.name, model.city, model.state)
+    query = model.query.with_entities(model.id, model.name, model.upcoming_shows_count.label('num_upcoming_shows'))
+    pageSize = current_app.config['SEARCH_PAGE_SIZE']
+    offset = (page - 1) * pageSize
+
+    if db.engine.dialect.name == 'postgresql':
+        term = search_term.lower()
+        match = or_(*(func.lower(c).contains(term) for c in columns))
+        rank = func.greatest(*(func.similarity(func.lower(c), term) for c in columns))
+        count = model.query.filter(match).count()
+        rows = query.filter(match) \
+            .order_by(rank.desc(), model.name).limit(pageSize).offset(offset).all()
+    else:
+        ids = current_app.extensions['search'][kind].search(db.session, search_term)
+        count = len(ids)
+        order = {id: i for i, id in enumerate(ids[offset:offset + pageSize])}
+        rows = query.filter(model.id.in_(order)).all() if order else []
+        rows.sort(key=lambda row: order[row.id])
+
+    return {
+        'count': count,
+        'data': [dict(row) for row in rows],
+        'page': page,
+        'pages': -(-count // pageSize)
+    }
+
 #----------------------------------------------------------------------------#
-# Filters.
+# Page cache.
 #----------------------------------------------------------------------------#
-db.create_all()
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
+# A committed change drops the pages that show the changed row: its own page,
+# the listings and the pages of the other side of its shows.
+pageCache.watchCommits(db.session)
+
+def historyOf(target, key):
+    # current and previously flushed values of a column on `target`
+    history = inspect(target).attrs[key].history
+    return {value for value in history.sum() if value is not None} | {getattr(target, key)}
+
+def venueTags(connection, venue):
+    artists = connection.execute(select(Show.artist_id).where(Show.venue_id == venue.id).distinct())
+    return {'home', 'venues', 'shows', 'venue:%d' % venue.id} | {'artist:%d' % row.artist_id for row in artists}
+
+def artistTags(connection, artist):
+    venues = connection.execute(select(Show.venue_id).where(Show.artist_id == artist.id).distinct())
+    return {'home', 'artists', 'shows', 'artist:%d' % artist.id} | {'venue:%d' % row.venue_id for row in venues}
+
+def showTags(connection, show):
+    return {'venues', 'shows'} \
+        | {'venue:%s' % id for id in historyOf(show, 'venue_id')} \
+        | {'artist:%s' % id for id in historyOf(show, 'artist_id')}
 
-app.jinja_env.filters['datetime'] = format_datetime
+pageCache.watch(Venue, venueTags)
+pageCache.watch(Artist, artistTags)
+pageCache.watch(Show, showTags)
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+# Page versions for the validators: one aggregate query per request, run
+# before the view's own queries. updated_at moves on every create/edit and
+# counter change; the row counts catch deletes, and the count of shows that
+# have started catches a show moving from upcoming to past.
+
+def newest(*times):
+    times = [time for time in times if time is not None]
+    return max(times) if times else None
+
+def latest(model, *where):
+    return select(func.max(model.updated_at)).where(*where).scalar_subquery()
+
+def total(model, *where):
+    return select(func.count(model.id)).where(*where).scalar_subquery()
+
+def homeVersion():
+    row = db.session.query(latest(Venue), total(Venue), latest(Artist), total(Artist)).one()
+    return newest(row[0], row[2]), (row[1], row[3])
+
+def venuesVersion():
+    row = db.session.query(latest(Venue), total(Venue)).one()
+    return row[0], row[1]
+
+def artistsVersion():
+    row = db.session.query(latest(Artist), total(Artist)).one()
+    return row[0], row[1]
+
+def ownerVersion(owner, key, other, otherKey, id):
+    # the owner row, its shows and the other side of them
+    row = db.session.query(
+        select(owner.updated_at).where(owner.id == id).scalar_subquery(),
+        func.max(Show.updated_at), func.max(other.updated_at), func.count(Show.id),
+        func.count(case((Show.start_time < datetime.now(), 1)))) \
+        .select_from(Show).join(other, otherKey == other.id).filter(key == id).one()
+    if row[0] is None:
+        return None
+    return newest(*row[:3]), tuple(row[3:])
+
+def venueVersion(venue_id):
+    return ownerVersion(Venue, Show.venue_id, Artist, Show.artist_id, venue_id)
+
+def artistVersion(artist_id):
+    return ownerVersion(Artist, Show.artist_id, Venue, Show.venue_id, artist_id)
+
+def showsVersion():
+    started = total(Show, Show.start_time < datetime.now())
+    row = db.session.query(latest(Show), latest(Venue), latest(Artist), total(Show), started).one()
+    return newest(*row[:3]), tuple(row[3:])
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+showCounters = ShowCounters(Show, [(Venue, Show.venue_id), (Artist, Show.artist_id)])
+showCounters.watch(db.session)
+
+counters_cli = AppGroup('counters', help='Maintain the upcoming/past show counters of venues and artists.')
+
+@counters_cli.command('rollover')
+def counters_rollover():
+    """Count shows that have started as past shows. Run it periodically,
+    e.g. every minute from cron."""
+    updated = showCounters.rollover(db.session.connection())
+    db.session.commit()
+    if any(updated.values()):
+        pageCache.invalidate(['venues', 'artists'])
+    for table, count in updated.items():
+        click.echo('%s: %d rolled over' % (table, count))
+
+@counters_cli.command('check')
+@click.option('--fix', is_flag=True, help='Rebuild every counter from the Show table.')
+def counters_check(fix):
+    """Compare the counters with a recount of the Show table."""
+    now = datetime.now()
+    connection = db.session.connection()
+    showCounters.rollover(connection, now)
+    mismatches = showCounters.mismatches(connection, now)
+    for table, id, upcoming, past, expected_upcoming, expected_past in mismatches:
+        click.echo('%s %d: upcoming %d (expected %d), past %d (expected %d)'
+                   % (table, id, upcoming, expected_upcoming, past, expected_past))
+    if fix:
+        showCounters.rebuild(connection, now)
+    db.session.commit()
+    pageCache.invalidate(['venues', 'artists'])
+    click.echo('%d mismatched rows%s' % (len(mismatches), ', rebuilt' if fix else ''))
+
+#----------------------------------------------------------------------------#
+# Bulk import/export.
+#----------------------------------------------------------------------------#
+
+fyyur_cli = AppGroup('fyyur', help='Bulk import and export of venues, artists and shows.')
+
+def openFile(filename, mode):
+    if filename == '-':
+        return click.get_text_stream('stdin' if mode == 'r' else 'stdout')
+    return open(filename, mode, newline='', encoding='utf-8')
+
+@fyyur_cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(kinds)))
+@click.argument('filename', type=click.Path(allow_dash=True))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows validated and loaded per transaction.')
+def fyyur_import(kind, filename, format, chunk_size):
+    """Load KIND rows from FILENAME ('-' for stdin), validated like the
+    create forms. Rejected rows are reported and skipped."""
+    def rejected(number, message):
+        click.echo('line %d: %s' % (number, message), err=True)
+
+    def progress(importer):
+        click.echo('%s: %d read, %d imported, %d rejected, %.0f rows/s'
+                   % (kind, importer.read, importer.imported, importer.rejected, importer.rate()), err=True)
+
+    importer = Importer(db.session, kinds[kind], chunk_size, rejected)
+    with openFile(filename, 'r') as stream:
+        importer.run(readRows(stream, formatOf(filename, format)), progress)
+    # the rows went in around the ORM events: bring the derived state along
+    if kind == 'shows':
+        showCounters.rebuild(db.session.connection())
+        db.session.commit()
+    ownerSearch.invalidate()
+    nameCompletion.invalidate()
+    pageCache.clear()
+
+@fyyur_cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(kinds)))
+@click.argument('filename', type=click.Path(allow_dash=True))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows fetched per round trip.')
+def fyyur_export(kind, filename, format, chunk_size):
+    """Write every KIND row to FILENAME ('-' for stdout) in the import format."""
+    started = time.perf_counter()
+    with openFile(filename, 'w') as stream:
+        count = writeRows(stream, formatOf(filename, format), kinds[kind],
+                          exportRows(db.session.connection(), kinds[kind], chunk_size))
+    elapsed = time.perf_counter() - started
+    click.echo('%s: %d exported, %.0f rows/s' % (kind, count, count / max(elapsed, 1e-9)), err=True)
+
+
+assets_cli = AppGroup('assets', help='Build the fingerprinted static files served under /static/dist.')
+
+@assets_cli.command('build')
+def assets_build():
+    """Bundle, minify, fingerprint and precompress the layouts' static files."""
+    build = Build(current_app.static_folder, current_app.config['ASSETS_DIR'])
+    current_app.extensions['assets'] = build.run()
+    for name, (size, gzipped, brotli) in sorted(build.sizes.items()):
+        click.echo('%s -> %s: %d bytes, gzip %s, brotli %s' % (
+            name, build.manifest[name], size, gzipped or '-', brotli or '-'))
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+# pattern of each named format; anything else is taken as a babel pattern
+datetimeFormats = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+    'date': "MMM dd y"
+}
+
+@lru_cache(maxsize=None)
+def datetimeFormatter(format, locale):
+    # parse the pattern and the locale once per (format, locale)
+    locale = babel.Locale.parse(locale)
+    if format in ('long', 'short'):
+        return lambda value: babel.dates.format_datetime(value, format, locale=locale)
+    pattern = babel.dates.parse_pattern(datetimeFormats.get(format, format))
+    return lambda value: pattern.apply(value, locale)
+
+@lru_cache(maxsize=4096)
+def formatDatetime(value, format, locale):
+    # listings repeat the same start times over and over
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    return datetimeFormatter(format, locale)(value)
+
+def format_datetime(value, format='medium', locale='en'):
+    return formatDatetime(value, format, locale)
+
+def stream_template(template_name, **context):
+    # like render_template, but yields the page chunk by chunk
+    current_app.update_template_context(context)
+    return current_app.jinja_env.get_template(template_name).generate(context)
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@main.route('/')
+@readOnly
+@conditional(homeVersion)
+@pageCache.cached(lambda: ['home'])
 def index():
-    recentVenues = Venue.query.with_entities(Venue.name, Venue.city, Venue.state, Venue.id).order_by(Venue.id.desc()).limit(10).all()
-    recentArtists  = Artist.query.with_entities(Artist.name, Artist.id).order_by(Artist.id.desc()).limit(10).all()
+    recentVenues, recentArtists = parallelReads.gather(
+        lambda: Venue.query.with_entities(Venue.name, Venue.city, Venue.state, Venue.id).order_by(Venue.id.desc()).limit(10).all(),
+        lambda: Artist.query.with_entities(Artist.name, Artist.id).order_by(Artist.id.desc()).limit(10).all())
     return render_template('pages/home.html', venues = recentVenues, artists = recentArtists)
 
 #  Venues
 #  ----------------------------------------------------------------
-@app.route('/venues')
+@main.route('/venues')
+@readOnly
+@conditional(venuesVersion)
+@pageCache.cached(lambda: ['venues'])
 def venues():
     # TODO: replace with real venues data.
     #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
-    data = []
-    result  = db.session.query().with_entities(Venue.name, Venue.city, Venue.state, Venue.id).all()
-    for venue in result:
-        val = dict(venue)
-        val['num_upcoming_shows'] = Show.query.filter((Show.venue_id == venue.id) & (Show.start_time >= datetime.now())).count()
-        data.append(val)
-    venues = list(reduce(reduceVenues, data, []))
+    result  = db.session.query(Venue.name, Venue.city, Venue.state, Venue.id, Venue.upcoming_shows_count.label('num_upcoming_shows'))
+    genre = request.args.get('genre')
+    if genre:
+        result = result.filter(Venue.genres.any(Genre.name == genre))
+    data = [dict(venue) for venue in result]
+    venues = groupVenues(data)
     return render_template('pages/venues.html', areas=venues)
 
 
-@app.route('/venues/search', methods=['POST'])
+@main.route('/venues/search', methods=['POST'])
+@readOnly
 def search_venues():
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-    response = {
-        'count': 0,
-        'data': []
-    }
-    
     search_term=request.form.get('search_term', '')
-    filterByname = func.lower(Venue.name).contains(func.lower(search_term))
-    filterBycity = func.lower(Venue.city).contains(func.lower(search_term))
-    filterByState = func.lower(Venue.state).contains(func.lower(search_term))
-
-    venue =  Venue.query.filter(filterByname | filterBycity | filterByState).with_entities(Venue.id, Venue.name).all()
-    for v in venue:
-        num_upcoming_shows = Show.query.filter((Show.venue_id == v.id) & (Show.start_time >= datetime.now())).count()
-        data = {
-            "id": v.id,
-            "name": v.name,
-            "num_upcoming_shows": num_upcoming_shows
-        }
-        response["data"].append(data)
-        
-    response["count"] = len(venue)
+    page = max(request.form.get('page', 1, type=int), 1)
+    response = searchEntities(Venue, 'venues', search_term, page)
     return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
-@app.route('/venues/<int:venue_id>')
+@main.route('/venues/<int:venue_id>')
+@readOnly
+@conditional(venueVersion)
+@pageCache.cached(lambda venue_id: ['venue:%d' % venue_id])
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
     # TODO: replace with real venue data from the venues table, using venue_id
-    venue = Venue.query.get(venue_id)
-    venue.genres = json.loads(venue.genres)
-    venue.past_shows = []
-    venue.upcoming_shows = []
-    past_shows  = db.session.query(Venue, Show).select_from(Show).join(Venue).filter(venue.id == Show.venue_id, Show.start_time < datetime.now()).all()
-    upcoming_shows  = db.session.query(Venue, Show).select_from(Show).join(Venue).filter(venue.id == Show.venue_id, Show.start_time >= datetime.now()).all()
-    ps_shows = createShowVenue(past_shows)
-    up_shows = createShowVenue(upcoming_shows)
-    venue.past_shows.extend(ps_shows)
-    venue.upcoming_shows.extend(up_shows)
-    venue.past_shows_count = len(ps_shows)
-    venue.upcoming_shows_count = len(up_shows)
+    now = datetime.now()
+    # the venue and all of its shows, with the artist of each loaded by the
+    # same join, side by side; the shows split into past and upcoming here
+    venue, shows = parallelReads.gather(
+        lambda: Venue.query.options(joinedload(Venue.genres)).get(venue_id),
+        lambda: Show.query.join(Show.artist).options(contains_eager(Show.artist))
+                          .filter(Show.venue_id == venue_id, Show.start_time != None).order_by(Show.start_time).all())
+    if venue is None:
+        abort(404)
+    venue.past_shows = createShowVenue([show for show in shows if show.start_time < now])
+    venue.upcoming_shows = createShowVenue([show for show in shows if show.start_time >= now])
 
     return render_template('pages/show_venue.html', venue=venue)
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     # TODO: insert form data as a new Venue record in the db, instead
     # TODO: modify data to be the data object returned from db insertion
     formData = VenueForm(request.form).data
     venue = Venue()
-    venue = createVenueEntity(dict(formData), venue)
+    venue = createVenueEntity(dict(formData), venue, genresByName(formData['genres']))
     try:
         db.session.add(venue)
         db.session.commit()
@@ -198,10 +437,10 @@ def create_venue_submission():
     # TODO: on unsuccessful db insert, flash an error instead.
     # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
     # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@main.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
     venue = Venue.query.get(venue_id)
     db.session.delete(venue)
@@ -213,7 +452,7 @@ def delete_venue(venue_id):
     # clicking that button delete it from the db then redirect the user to the homepage
     flash('Venue ' + venue.name + ' was successfully deleted!')
     # return render_template('pages/home.html')
-    return redirect(url_for('venues'))
+    return redirect(url_for('main.venues'))
 
 
 
@@ -221,75 +460,78 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists')
+@main.route('/artists')
+@readOnly
+@conditional(artistsVersion)
+@pageCache.cached(lambda: ['artists'])
 def artists():
     # TODO: replace with real data returned from querying the database
-    data = Artist.query.with_entities(Artist.id, Artist.name).all()
-    
+    data = Artist.query.with_entities(Artist.id, Artist.name)
+    genre = request.args.get('genre')
+    if genre:
+        data = data.filter(Artist.genres.any(Genre.name == genre))
+    data = data.all()
+
     return render_template('pages/artists.html', artists=data)
 
-@app.route('/artists/search', methods=['POST'])
+@main.route('/artists/search', methods=['POST'])
+@readOnly
 def search_artists():
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
-    response = {
-        'count': 0,
-        'data': []
-    }
-    
     search_term = request.form.get('search_term', '')
-    filterByname = func.lower(Artist.name).contains(func.lower(search_term))
-    filterBycity = func.lower(Artist.city).contains(func.lower(search_term))
-    filterByState = func.lower(Artist.state).contains(func.lower(search_term))
-
-    artists =  Artist.query.filter(filterByname | filterBycity | filterByState).with_entities(Artist.id, Artist.name).all()
-    for artist in artists:
-        num_upcoming_shows = Show.query.filter((Show.artist_id == artist.id) & (Show.start_time >= datetime.now())).count()
-        data = {
-            "id": artist.id,
-            "name": artist.name,
-            "num_upcoming_shows": num_upcoming_shows
-        }
-        response["data"].append(data)
-        
-    response["count"] = len(artists)
-    
+    page = max(request.form.get('page', 1, type=int), 1)
+    response = searchEntities(Artist, 'artists', search_term, page)
+
     return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 
-@app.route('/artists/<int:artist_id>')
+@main.route('/autocomplete')
+@readOnly
+def autocomplete():
+    # venue and artist names starting with ?q=, case-insensitively; ?kind=
+    # venues|artists for just one of them, ?limit= per kind
+    config = current_app.config
+    limit = min(max(request.args.get('limit', config['AUTOCOMPLETE_LIMIT'], type=int), 1),
+                config['AUTOCOMPLETE_MAX_LIMIT'])
+    kind = request.args.get('kind')
+    kinds = [kind] if kind in nameCompletion.models else list(nameCompletion.models)
+    return respond(nameCompletion.complete(request.args.get('q', '').strip(), kinds, limit))
+
+@main.route('/artists/<int:artist_id>')
+@readOnly
+@conditional(artistVersion)
+@pageCache.cached(lambda artist_id: ['artist:%d' % artist_id])
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
     # TODO: replace with real artist data from the artist table, using artist_id
-    artist = Artist.query.get(artist_id)
-    artist.genres = json.loads(artist.genres)
-    artist.past_shows = []
-    artist.upcoming_shows = []
-    past_shows  = db.session.query(Artist, Show).select_from(Show).join(Artist).filter(artist.id == Show.artist_id, Show.start_time < datetime.now()).all()
-    upcoming_shows  = db.session.query(Artist, Show).select_from(Show).join(Artist).filter(artist.id == Show.artist_id, Show.start_time >= datetime.now()).all()
-    ps_shows = createShowArtist(past_shows)
-    up_shows = createShowArtist(upcoming_shows)
-    artist.past_shows.extend(ps_shows)
-    artist.upcoming_shows.extend(up_shows)
-    artist.past_shows_count = len(ps_shows)
-    artist.upcoming_shows_count = len(up_shows)
-   
+    now = datetime.now()
+    # the artist and all of its shows, with the venue of each loaded by the
+    # same join, side by side; the shows split into past and upcoming here
+    artist, shows = parallelReads.gather(
+        lambda: Artist.query.options(joinedload(Artist.genres)).get(artist_id),
+        lambda: Show.query.join(Show.venue).options(contains_eager(Show.venue))
+                          .filter(Show.artist_id == artist_id, Show.start_time != None).order_by(Show.start_time).all())
+    if artist is None:
+        abort(404)
+    artist.past_shows = createShowArtist([show for show in shows if show.start_time < now])
+    artist.upcoming_shows = createShowArtist([show for show in shows if show.start_time >= now])
+
     return render_template('pages/show_artist.html', artist=artist)
 
 #  Update
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     form = ArtistForm()
     result = Artist.query.get(artist_id)
-    result.genres = json.loads(result.genres)
     
     # TODO: populate form with fields from artist with ID <artist_id>
     form.name.data = result.name
-    form.genres.data = result.genres
+    form.genres.data = [genre.name for genre in result.genres]
     form.city.data = result.city
     form.state.data = result.state
     form.phone.data = result.phone
@@ -301,25 +543,24 @@ def edit_artist(artist_id):
     return render_template('forms/edit_artist.html', form=form, artist=result)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     # TODO: take values from the form submitted, and update existing
     # artist record with ID <artist_id> using the new attributes
     formData = ArtistForm(request.form).data
     artist = Artist.query.get(artist_id)
-    artist = createArtistEntity(dict(formData), artist)
+    artist = createArtistEntity(dict(formData), artist, genresByName(formData['genres']))
     db.session.commit()
-    return redirect(url_for('show_artist', artist_id=artist_id))
+    return redirect(url_for('main.show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     form = VenueForm()
     result = Venue.query.get(venue_id)
-    result.genres = json.loads(result.genres)
     # TODO: populate form with values from venue with ID <venue_id>
     form.name.data = result.name
-    form.genres.data = result.genres
+    form.genres.data = [genre.name for genre in result.genres]
     form.address.data = result.address
     form.city.data = result.city
     form.state.data = result.state
@@ -332,34 +573,34 @@ def edit_venue(venue_id):
     return render_template('forms/edit_venue.html', form=form, venue=result)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     # TODO: take values from the form submitted, and update existing
     # venue record with ID <venue_id> using the new attributes
     formData = VenueForm(request.form).data
     venue = Venue.query.get(venue_id)
-    venue = createVenueEntity(dict(formData), venue)
+    venue = createVenueEntity(dict(formData), venue, genresByName(formData['genres']))
     db.session.commit()
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    return redirect(url_for('main.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     # called upon submitting the new artist listing form
     # TODO: insert form data as a new Venue record in the db, instead
     # TODO: modify data to be the data object returned from db insertion
     formData = ArtistForm(request.form).data
     artist = Artist()
-    artist = createArtistEntity(dict(formData), artist)
+    artist = createArtistEntity(dict(formData), artist, genresByName(formData['genres']))
    
     try:
         db.session.add(artist)
@@ -372,52 +613,125 @@ def create_artist_submission():
     # on successful db insert, flash success
     # TODO: on unsuccessful db insert, flash an error instead.
     # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@main.route('/shows')
+@readOnly
+@conditional(showsVersion)
+@pageCache.cached(lambda: ['shows'])
 def shows():
-    # displays list of shows at /shows
-    # TODO: replace with real venues data.
-    data = []
-    result  = db.session.query(Show, Artist, Venue).join(Artist,Show.artist_id==Artist.id).join(Venue, Show.venue_id==Venue.id).all()
-    for row in result:
-        res = {}
-        res['artist_id'] = row['Show'].artist_id
-        res['artist_name'] = row['Artist'].name
-        res['artist_image_link'] = row['Artist'].image_link
-        res['venue_id'] = row['Show'].venue_id
-        res['venue_name'] = row['Venue'].name
-        res['start_time'] = row['Show'].start_time.strftime("%b %d %Y ")
-        data.append(res)
-
-    return render_template('pages/shows.html', shows=data)
-
-
-@app.route('/shows/create')
+    # displays list of shows at /shows, one keyset page at a time:
+    #   ?after=<cursor>  continue after the last show of the previous page
+    #   ?limit=<n>       page size, capped at SHOWS_MAX_PAGE_SIZE
+    #   ?upcoming=1      only shows that have not started yet
+    #   ?stream=1        stream the page while rows are read
+    limit = request.args.get('limit', current_app.config['SHOWS_PAGE_SIZE'], type=int)
+    limit = min(max(limit, 1), current_app.config['SHOWS_MAX_PAGE_SIZE'])
+    upcoming = request.args.get('upcoming', 0, type=int) == 1
+    try:
+        after = decodeCursor(request.args['after']) if request.args.get('after') else None
+    except ValueError:
+        abort(400)
+
+    # one extra row tells whether there is a next page
+    result = showListing(upcoming, after).limit(limit + 1)
+
+    page = {'limit': limit, 'upcoming': upcoming, 'next': None}
+
+    def rows():
+        for i, row in enumerate(result.yield_per(limit + 1)):
+            if i == limit:
+                page['next'] = encodeCursor(last.start_time, last.id)
+                break
+            last = row
+            yield {
+                'artist_id': row.artist_id,
+                'artist_name': row.artist_name,
+                'artist_image_link': row.artist_image_link,
+                'venue_id': row.venue_id,
+                'venue_name': row.venue_name,
+                'start_time': row.start_time
+            }
+
+    if request.args.get('stream', 0, type=int) == 1:
+        return Response(stream_with_context(stream_template('pages/shows.html', shows=rows(), page=page)))
+    return render_template('pages/shows.html', shows=list(rows()), page=page)
+
+
+def exportedShows():
+    # ?from=<date>&to=<date> bound start_time, from inclusive, to exclusive
+    try:
+        since, until = (datetime.fromisoformat(request.args[name]) if request.args.get(name) else None
+                        for name in ('from', 'to'))
+    except ValueError:
+        abort(400)
+    # a server-side cursor, so memory stays flat however many shows there are
+    return showListing(since=since, until=until).yield_per(1000)
+
+exportColumns = ['id', 'start_time', 'end_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link']
+
+@main.route('/shows/export.csv')
+@readOnly
+@conditional(showsVersion)
+def export_shows_csv():
+    rows = ([row.id, row.start_time.isoformat(), row.end_time.isoformat() if row.end_time else '', row.venue_id, row.venue_name,
+             row.artist_id, row.artist_name, row.artist_image_link] for row in exportedShows())
+    return Response(stream_with_context(csvChunks(exportColumns, rows)), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=shows.csv'})
+
+@main.route('/shows/export.ndjson')
+@readOnly
+@conditional(showsVersion)
+def export_shows_ndjson():
+    rows = ({column: getattr(row, column) for column in exportColumns} for row in exportedShows())
+    return Response(stream_with_context(ndjsonChunks(rows, dumps)), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=shows.ndjson'})
+
+@main.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
 def create_show_submission():
     # called to create new shows in the db, upon submitting new show listing form
     # TODO: insert form data as a new Show record in the db, instead
-    formData = ShowForm(request.form).data
+    form = ShowForm(request.form)
+    if not form.validate():
+        for field, messages in form.errors.items():
+            flash('Show could not be listed: %s: %s' % (field, ' '.join(messages)))
+        return render_template('forms/new_show.html', form=form), 400
     show = Show()
-    show.artist_id = formData['artist_id']
-    show.venue_id = formData['venue_id']
-    show.start_time = formData['start_time']
+    show.artist_id = form.artist_id.data
+    show.venue_id = form.venue_id.data
+    show.start_time = form.start_time.data
 
     try:
+        show.end_time = showEnd(show.start_time, form.end_time.data)
+        try:
+            venueId, artistId = int(show.venue_id), int(show.artist_id)
+        except (TypeError, ValueError):
+            raise ValueError('the venue and artist IDs must be numbers.')
+        connection = db.session.connection()
+        if not existing(connection, Venue.id, {venueId}):
+            raise ValueError('there is no venue with ID %d.' % venueId)
+        if not existing(connection, Artist.id, {artistId}):
+            raise ValueError('there is no artist with ID %d.' % artistId)
+        clashes = conflicts(connection, [(None, venueId, artistId, show.start_time, show.end_time)])
+        if clashes:
+            raise ValueError('; '.join(describe(conflict) for conflict in clashes) + '.')
         db.session.add(show)
         db.session.commit()
         flash('Show was successfully listed!')
+    except ValueError as e:
+        db.session.rollback()
+        flash('Show could not be listed: %s' % e)
     except Exception  as e:
         db.session.rollback()
         flash('An error occurred. Show  could not be listed.')
@@ -426,42 +740,121 @@ def create_show_submission():
     # TODO: on unsuccessful db insert, flash an error instead.
     # e.g., flash('An error occurred. Show could not be listed.')
     # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
+
+
+@main.route('/shows/bulk', methods=['POST'])
+def create_shows_bulk():
+    # a whole tour as JSON, [{"venue_id", "artist_id", "start_time", "end_time"}, ...]
+    # or {"shows": [...]}: every show is listed in one transaction, or none is;
+    # errors and conflicts refer to the shows by their index in the list
+    rows = request.get_json(silent=True)
+    if isinstance(rows, dict):
+        rows = rows.get('shows')
+    if not isinstance(rows, list):
+        return respond({'errors': [{'error': 'expected a JSON list of shows'}]}, 400)
+    if len(rows) > current_app.config['SHOWS_BULK_MAX']:
+        return respond({'errors': [{'error': 'at most %d shows at once' % current_app.config['SHOWS_BULK_MAX']}]}, 413)
+
+    errors = []
+    importer = Importer(db.session, kinds['shows'],
+                        onReject=lambda index, message: errors.append({'index': index, 'error': message}))
+    checked = [importer.check(index, {key: value for key, value in row.items() if key != 'id'}
+                              if isinstance(row, dict) else None)
+               for index, row in enumerate(rows)]
+    accepted = importer.checkChunk(db.session.connection(), [row for row in checked if row is not None])
+    if errors:
+        db.session.rollback()
+        errors.sort(key=lambda error: error['index'])
+        overlaps = sorted(importer.conflicts, key=lambda conflict: conflict['ref'])
+        return respond({'errors': errors, 'conflicts': overlaps}, 409 if overlaps else 400)
+
+    shows = [Show(**values) for _, values, _ in accepted]
+    db.session.add_all(shows)
+    try:
+        db.session.flush()
+        # read before the commit expires them, which would reload each show
+        created = [show.id for show in shows]
+        db.session.commit()
+    except IntegrityError:
+        # a constraint caught what the checks did not, e.g. a show listed meanwhile
+        db.session.rollback()
+        return respond({'errors': [{'error': 'the shows conflict with the database, try again'}]}, 409)
+    return respond({'created': created}, 201)
+
 
 
+#  Internal
+#  ----------------------------------------------------------------
 
-@app.errorhandler(404)
+def internal(view):
+    # with INTERNAL_TOKEN set, for requests that bear it; otherwise for
+    # requests from this host that did not come through a proxy
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get('INTERNAL_TOKEN')
+        if token:
+            allowed = hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                          ('Bearer ' + token).encode())
+        else:
+            allowed = request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+        if not allowed:
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
+
+@main.route('/internal/cache')
+@internal
+def cache_stats():
+    return jsonify(pageCache.stats())
+
+
+@main.route('/internal/pool')
+@internal
+def pool_stats():
+    stats = poolStats(db.engine.pool)
+    stats['replicas'] = current_app.extensions['replicas'].stats()
+    return jsonify(stats)
+
+
+@main.route('/internal/autocomplete')
+@internal
+def autocomplete_stats():
+    return jsonify(nameCompletion.stats())
+
+
+@main.route('/internal/logging')
+@internal
+def logging_stats():
+    listener = current_app.extensions.get('logQueue')
+    return jsonify(listener.stats() if listener else {'policy': None})
+
+
+@main.app_errorhandler(404)
 def not_found_error(error):
+    if isApiRequest():
+        return apiError(error)
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
+    if isApiRequest():
+        return apiError(error)
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
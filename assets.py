@@ -0,0 +1,188 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import abort, current_app, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+# Static files for the layouts. `flask assets build` joins the stylesheets
+# and scripts of each BUNDLES entry into one minified file, and copies the
+# bundles, the fonts their stylesheets refer to and FILES into ASSETS_DIR
+# (static/dist/ by default) under names that carry a hash of their content,
+# and writes .gz (and, with the brotli package, .br) siblings of the ones
+# that compress. Its manifest.json maps each name to its copy.
+#
+# static_url() and bundle_urls() point the templates at those copies, which
+# are served with a far-future immutable Cache-Control, the precompressed
+# sibling chosen by Accept-Encoding: a change of content is a new name. Before
+# a build they point at the files under static/ as they are, so development
+# needs no build step. A build keeps the copies of earlier ones, for the pages
+# that were rendered before it.
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+BUNDLES = {
+    'main.css': ['css/bootstrap.min.css', 'css/icons.css', 'css/layout.main.css', 'css/main.css',
+                 'css/main.responsive.css', 'css/main.quickfix.css'],
+    'head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    'body.js': ['js/libs/jquery-1.11.1.min.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js',
+                'js/script.js'],
+}
+FILES = ['img/front-splash.jpg', 'js/libs/respond-1.4.2.min.js']
+# only these are worth precompressing, the others (woff, images) already are
+COMPRESSIBLE = {'.css', '.js', '.svg', '.ttf', '.eot', '.otf'}
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+HASH_LENGTH = 12
+
+URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def minifyCss(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text, keep_bang_comments=True)
+    # comments (but the /*! licenses) and whitespace, short of what rcssmin does
+    text = re.sub(r'/\*(?!!).*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r' ?([{};,>]) ?', r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def minifyJs(text, source):
+    if source.endswith('.min.js') or rjsmin is None:
+        return text
+    return rjsmin.jsmin(text, keep_bang_comments=True)
+
+
+class Build:
+    """One `flask assets build` of the files under `static`, into `dist`
+    (static/dist/ by default)."""
+
+    def __init__(self, static, dist=None):
+        self.static = static
+        self.dist = dist or os.path.join(static, DIST)
+        self.manifest = {}
+        # name -> (bytes, gzipped bytes, brotli bytes)
+        self.sizes = {}
+
+    def run(self):
+        os.makedirs(self.dist, exist_ok=True)
+        for name, sources in BUNDLES.items():
+            if name.endswith('.css'):
+                text = '\n'.join(self.css(source) for source in sources)
+            else:
+                text = '\n;\n'.join(minifyJs(self.read(source), source) for source in sources)
+            self.write(name, text.encode('utf-8'))
+        for name in FILES:
+            self.copy(name)
+        with open(os.path.join(self.dist, MANIFEST), 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        return self.manifest
+
+    def read(self, name):
+        with open(os.path.join(self.static, name), encoding='utf-8') as f:
+            return f.read()
+
+    def css(self, source):
+        # a url() to a file under static/ becomes one to its copy; the others
+        # resolve as they did, static/dist/ being as deep as static/css/
+        def rewrite(match):
+            url = match.group(2)
+            if re.match(r'[a-z]+:|/|#', url):
+                return match.group(0)
+            path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+            name = os.path.normpath(os.path.join(os.path.dirname(source), path)).replace(os.sep, '/')
+            if not os.path.isfile(os.path.join(self.static, name)):
+                return match.group(0)
+            return 'url("%s%s")' % (self.copy(name), suffix)
+        return URL.sub(rewrite, minifyCss(self.read(source)))
+
+    def copy(self, name):
+        if name not in self.manifest:
+            with open(os.path.join(self.static, name), 'rb') as f:
+                self.write(name, f.read())
+        return self.manifest[name]
+
+    def write(self, name, data):
+        stem, ext = os.path.splitext(os.path.basename(name))
+        hashed = '%s.%s%s' % (stem, hashlib.sha256(data).hexdigest()[:HASH_LENGTH], ext)
+        path = os.path.join(self.dist, hashed)
+        with open(path, 'wb') as f:
+            f.write(data)
+        sizes = [len(data), None, None]
+        if ext in COMPRESSIBLE:
+            sizes[1] = self.compressed(path + '.gz', gzip.compress(data, 9, mtime=0), len(data))
+            if brotli is not None:
+                sizes[2] = self.compressed(path + '.br', brotli.compress(data, quality=11), len(data))
+        self.manifest[name] = hashed
+        self.sizes[name] = tuple(sizes)
+
+    def compressed(self, path, data, size):
+        # a sibling that saves little is not worth the Vary
+        if len(data) > size * 0.9:
+            return None
+        with open(path, 'wb') as f:
+            f.write(data)
+        return len(data)
+
+
+def staticUrl(filename):
+    hashed = current_app.extensions['assets'].get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets', filename=hashed)
+
+
+def bundleUrls(name):
+    if name in current_app.extensions['assets']:
+        return [staticUrl(name)]
+    return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+
+def sendAsset(filename):
+    directory = current_app.config['ASSETS_DIR']
+    maxAge = current_app.config['ASSETS_MAX_AGE']
+    mimetype = mimetypes.guess_type(filename)[0]
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        path = safe_join(directory, filename + suffix)
+        if path is None:
+            abort(404)
+        if accepted[encoding] and os.path.isfile(path):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=maxAge)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype, max_age=maxAge)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+
+class StaticAssets:
+
+    def init_app(self, app):
+        try:
+            with open(os.path.join(app.config['ASSETS_DIR'], MANIFEST)) as f:
+                app.extensions['assets'] = json.load(f)
+        except FileNotFoundError:
+            app.extensions['assets'] = {}
+        app.add_url_rule(app.static_url_path + '/' + DIST + '/<path:filename>', 'assets', sendAsset)
+        app.jinja_env.globals.update(static_url=staticUrl, bundle_urls=bundleUrls)
@@ -0,0 +1,259 @@
+import sys
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import object_session
+
+from models import db
+
+# Name typeahead for /autocomplete. The names of every venue and artist sit
+# in a sorted array in process memory, so a lookup is a binary search rather
+# than a LIKE over the table. Each entry is a single string, the name and the
+# id joined by SEPARATOR, kept in the order of its lowercased form; a list
+# indexed by id points at the same strings, to find an entry again when its
+# row is renamed or deleted.
+#
+# This process's own writes reach the index when they commit. Other
+# processes' are picked up every AUTOCOMPLETE_REFRESH seconds: rows whose
+# updated_at moved are read again through its index, and if the row count
+# no longer matches (a delete elsewhere) the index is rebuilt in the
+# background while the old one keeps answering. Each app has indexes of its
+# own, in app.extensions['autocomplete'].
+
+SEPARATOR = '\x00'
+
+
+class PrefixIndex:
+
+    def __init__(self):
+        self.entries = []
+        self.byId = []
+        self.stringBytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def entry(id, name):
+        return '%s%s%d' % (name.replace(SEPARATOR, ''), SEPARATOR, id)
+
+    def load(self, rows):
+        # (id, name) rows into an empty index, sorted once
+        for id, name in rows:
+            self.place(id, self.entry(id, name))
+            self.entries.append(self.byId[id])
+        self.entries.sort(key=str.lower)
+
+    def place(self, id, entry):
+        if id >= len(self.byId):
+            self.byId.extend([None] * (id + 1 - len(self.byId)))
+        self.byId[id] = entry
+        self.stringBytes += sys.getsizeof(entry)
+
+    def position(self, key):
+        # the first entry whose lowercased form is not below `key`
+        entries = self.entries
+        lo, hi = 0, len(entries)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if entries[mid].lower() < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def name(self, id):
+        entry = self.byId[id] if id < len(self.byId) else None
+        return entry.rpartition(SEPARATOR)[0] if entry is not None else None
+
+    def add(self, id, name):
+        self.remove(id)
+        entry = self.entry(id, name)
+        self.entries.insert(self.position(entry.lower()), entry)
+        self.place(id, entry)
+
+    def remove(self, id):
+        entry = self.byId[id] if id < len(self.byId) else None
+        if entry is None:
+            return
+        i = self.position(entry.lower())
+        while self.entries[i] is not entry:
+            i += 1
+        del self.entries[i]
+        self.byId[id] = None
+        self.stringBytes -= sys.getsizeof(entry)
+
+    def complete(self, prefix, limit):
+        prefix = prefix.replace(SEPARATOR, '').lower()
+        found = []
+        for i in range(self.position(prefix), len(self.entries)):
+            entry = self.entries[i]
+            if len(found) == limit or not entry.lower().startswith(prefix):
+                break
+            name, _, id = entry.rpartition(SEPARATOR)
+            found.append({'id': int(id), 'name': name})
+        return found
+
+    def memory(self):
+        return sys.getsizeof(self.entries) + sys.getsizeof(self.byId) + self.stringBytes
+
+
+class NameIndex:
+    """PrefixIndex of `model.name`, built on first use."""
+
+    def __init__(self, model):
+        self.model = model
+        self.index = None
+        # `lock` covers lookups and changes, `updating` the reads of the table
+        self.lock = threading.Lock()
+        self.updating = threading.Lock()
+        # the newest updated_at read, and when the table was last checked
+        self.seenUpTo = None
+        self.checkedAt = 0.0
+        self.rebuilding = False
+        self.buildSeconds = None
+        self.refreshes = 0
+        self.rebuilds = 0
+
+    def read(self):
+        model = self.model
+        rows = db.session.execute(select(model.id, model.name, model.updated_at)).all()
+        index = PrefixIndex()
+        index.load((id, name) for id, name, _ in rows)
+        return index, max((updated for _, _, updated in rows), default=None)
+
+    def build(self):
+        started = time.perf_counter()
+        index, seenUpTo = self.read()
+        with self.lock:
+            self.index, self.seenUpTo = index, seenUpTo
+            self.checkedAt = time.monotonic()
+            self.buildSeconds = time.perf_counter() - started
+            self.rebuilding = False
+
+    def current(self, refreshAfter):
+        if self.index is None:
+            with self.updating:
+                if self.index is None:
+                    self.build()
+        elif time.monotonic() - self.checkedAt >= refreshAfter and not self.rebuilding \
+                and self.updating.acquire(blocking=False):
+            try:
+                self.refresh()
+            finally:
+                self.updating.release()
+        return self.index
+
+    def refresh(self):
+        model = self.model
+        query = select(model.id, model.name, model.updated_at)
+        if self.seenUpTo is not None:
+            query = query.where(model.updated_at >= self.seenUpTo)
+        changed = db.session.execute(query).all()
+        count = db.session.execute(select(func.count()).select_from(model)).scalar()
+        with self.lock:
+            self.checkedAt = time.monotonic()
+            self.refreshes += 1
+            for id, name, updated in changed:
+                if self.index.name(id) != name:
+                    self.index.add(id, name)
+                self.seenUpTo = max(self.seenUpTo or updated, updated)
+            if count == len(self.index) or self.rebuilding:
+                return
+            self.rebuilding = True
+            self.rebuilds += 1
+        threading.Thread(target=self.rebuild, args=(current_app._get_current_object(),), daemon=True).start()
+
+    def rebuild(self, app):
+        with app.app_context():
+            try:
+                self.build()
+            except Exception:
+                self.rebuilding = False
+                app.logger.exception('Rebuilding the %s autocomplete index failed', self.model.__name__)
+
+    def apply(self, id, name):
+        with self.lock:
+            if self.index is None:
+                return
+            if name is None:
+                self.index.remove(id)
+            else:
+                self.index.add(id, name)
+
+    def complete(self, prefix, limit, refreshAfter):
+        index = self.current(refreshAfter)
+        with self.lock:
+            return index.complete(prefix, limit)
+
+    def stats(self):
+        index = self.index
+        return {
+            'names': len(index) if index is not None else None,
+            'bytes': index.memory() if index is not None else None,
+            'bytes_per_name': round(index.memory() / len(index), 1) if index else None,
+            'build_seconds': round(self.buildSeconds, 3) if self.buildSeconds is not None else None,
+            'refreshes': self.refreshes,
+            'rebuilds': self.rebuilds,
+        }
+
+
+class Autocomplete:
+
+    def __init__(self, **models):
+        # kind -> model with `id`, `name` and `updated_at`
+        self.models = models
+        for kind, model in models.items():
+            event.listen(model, 'after_insert', self.touched(kind))
+            event.listen(model, 'after_update', self.touched(kind))
+            event.listen(model, 'after_delete', self.touched(kind, deleted=True))
+
+    def init_app(self, app):
+        app.extensions['autocomplete'] = {kind: NameIndex(model) for kind, model in self.models.items()}
+        if app.config.get('AUTOCOMPLETE_WARM'):
+            threading.Thread(target=self.warm, args=(app,), daemon=True).start()
+
+    def warm(self, app):
+        with app.app_context():
+            try:
+                for index in app.extensions['autocomplete'].values():
+                    index.current(app.config['AUTOCOMPLETE_REFRESH'])
+            except Exception:
+                app.logger.exception('Building the autocomplete indexes failed')
+
+    def touched(self, kind, deleted=False):
+        def listener(mapper, connection, target):
+            if not deleted and not inspect(target).attrs.name.history.has_changes():
+                return
+            object_session(target).info.setdefault('autocomplete', []).append(
+                (kind, target.id, None if deleted else target.name))
+        return listener
+
+    def watchCommits(self, session):
+        # names change in the app's indexes once their rows are committed
+        @event.listens_for(session, 'after_commit')
+        def afterCommit(session):
+            touched = session.info.pop('autocomplete', ())
+            if touched:
+                indexes = current_app.extensions['autocomplete']
+                for kind, id, name in touched:
+                    indexes[kind].apply(id, name)
+
+        @event.listens_for(session, 'after_rollback')
+        def afterRollback(session):
+            session.info.pop('autocomplete', None)
+
+    def invalidate(self):
+        for index in current_app.extensions['autocomplete'].values():
+            index.index = None
+
+    def complete(self, prefix, kinds, limit):
+        indexes = current_app.extensions['autocomplete']
+        refreshAfter = current_app.config['AUTOCOMPLETE_REFRESH']
+        return {kind: indexes[kind].complete(prefix, limit, refreshAfter) if prefix else []
+                for kind in kinds}
+
+    def stats(self):
+        return {kind: index.stats() for kind, index in current_app.extensions['autocomplete'].items()}
@@ -0,0 +1,11 @@
+import types
+
+import config
+
+
+def benchConfig(database_url, **overrides):
+    """The settings of config.py pointed at `database_url`, for create_app()."""
+    settings = {key: getattr(config, key) for key in dir(config) if key.isupper()}
+    settings.update(SQLALCHEMY_DATABASE_URI=database_url, WTF_CSRF_ENABLED=False)
+    settings.update(overrides)
+    return types.SimpleNamespace(**settings)
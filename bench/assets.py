@@ -0,0 +1,46 @@
+"""Bytes and requests of the layouts' static files, as files under static/
+and as the bundles of `flask assets build` (see assets.py).
+
+    python -m bench.assets
+
+Builds into a temporary directory, leaving static/dist/ alone. Reports per
+bundle the number of source files, their total size, and the size of the
+bundle as it is, gzipped and brotli-compressed (null without the brotli
+package); then the requests and bytes a first visit to a page fetches from
+/static before (every file as it is, Flask serving nothing compressed) and
+after (one request per bundle, the smallest sibling), as JSON.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from assets import BUNDLES, Build
+
+STATIC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--static', default=STATIC)
+    args = parser.parse_args()
+
+    build = Build(args.static, tempfile.mkdtemp())
+    build.run()
+    bundles = {}
+    before = {'requests': 0, 'bytes': 0}
+    after = {'requests': 0, 'bytes': 0}
+    for name, sources in BUNDLES.items():
+        size, gzipped, brotli = build.sizes[name]
+        sourceBytes = sum(os.path.getsize(os.path.join(args.static, source)) for source in sources)
+        bundles[name] = {'sources': len(sources), 'source_bytes': sourceBytes, 'bytes': size,
+                         'gzip_bytes': gzipped, 'brotli_bytes': brotli}
+        before['requests'] += len(sources)
+        before['bytes'] += sourceBytes
+        after['requests'] += 1
+        after['bytes'] += min(filter(None, (size, gzipped, brotli)))
+    print(json.dumps({'bundles': bundles, 'before': before, 'after': after}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
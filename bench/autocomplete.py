@@ -0,0 +1,89 @@
+"""Microbenchmark: the /autocomplete prefix index at scale.
+
+    python -m bench.autocomplete [--names 1000000] [--lookups 100000] [--updates 1000] [--limit 10]
+
+Loads --names generated names into autocomplete.PrefixIndex and reports
+the build time, the memory the index accounts for next to what tracemalloc
+saw it allocate, the p50/p99/max latency of lookups for 1 to 6 character
+prefixes typed from existing names, and of renames (a remove and an
+insert) in microseconds.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from autocomplete import PrefixIndex
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'the', 'son', 'vel', 'dor', 'an', 'is', 'qu', 'ben', 'tri', 'o',
+             'zu', 'har', 'pel', 'ste', 'wy', 'nox', 'fa', 'gri', 'ul', 'mar', 'cy']
+SUFFIXES = ['', '', '', ' Hall', ' Club', ' Band', ' Trio', ' Collective', ' Lounge', ' & Co']
+
+
+def makeNames(count, rnd):
+    def word():
+        return ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize()
+    return ['%s %s%s' % (word(), word(), rnd.choice(SUFFIXES)) for _ in range(count)]
+
+
+def percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {'p50_us': round(cuts[49], 2), 'p99_us': round(cuts[98], 2), 'max_us': round(max(samples), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    names = makeNames(args.names, rnd)
+
+    started = time.perf_counter()
+    index = PrefixIndex()
+    index.load(enumerate(names, 1))
+    build = time.perf_counter() - started
+    # again under tracemalloc, which would have slowed the timed build down
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    traced = PrefixIndex()
+    traced.load(enumerate(names, 1))
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del traced
+
+    lookups = []
+    found = 0
+    for _ in range(args.lookups):
+        prefix = rnd.choice(names)[:rnd.randint(1, 6)].lower()
+        start = time.perf_counter()
+        found += len(index.complete(prefix, args.limit))
+        lookups.append((time.perf_counter() - start) * 1e6)
+
+    updates = []
+    for _ in range(args.updates):
+        id = rnd.randint(1, args.names)
+        name = makeNames(1, rnd)[0]
+        start = time.perf_counter()
+        index.add(id, name)
+        updates.append((time.perf_counter() - start) * 1e6)
+
+    print(json.dumps({
+        'names': len(index),
+        'build_seconds': round(build, 3),
+        'accounted_bytes': index.memory(),
+        'allocated_bytes': allocated,
+        'bytes_per_name': round(index.memory() / len(index), 1),
+        'lookup': dict(percentiles(lookups), results_avg=round(found / args.lookups, 2)),
+        'rename': percentiles(updates),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Microbenchmark: the `datetime` Jinja filter over a page of shows.
+
+    python -m bench.format_datetime [--shows 10000] [--distinct 500] [--format full]
+
+Renders the shows through a template once with the filter it replaced,
+which parsed strftime'd strings with dateutil and rebuilt the babel pattern
+on every call, and once with app.format_datetime on datetime objects.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from jinja2 import Environment
+
+from app import format_datetime, formatDatetime
+
+template = '{% for show in shows %}<h6>{{ show.start_time|datetime(format) }}</h6>{% endfor %}'
+
+
+def oldFormatDatetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def makeStartTimes(size, distinct, seed=0):
+    rnd = random.Random(seed)
+    start = datetime(2026, 1, 1, 20, 0)
+    times = [start + timedelta(hours=rnd.randrange(24 * 365)) for _ in range(distinct)]
+    return [rnd.choice(times) for _ in range(size)]
+
+
+def render(filter, shows, format):
+    env = Environment()
+    env.filters['datetime'] = filter
+    start = time.perf_counter()
+    page = env.from_string(template).render(shows=shows, format=format)
+    return time.perf_counter() - start, page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--distinct', type=int, default=500,
+                        help='number of distinct start times among the shows')
+    parser.add_argument('--format', default='full')
+    args = parser.parse_args()
+
+    startTimes = makeStartTimes(args.shows, args.distinct)
+    # the views used to hand the template strftime'd strings
+    oldShows = [{'start_time': value.strftime('%Y-%m-%d %H:%M:%S')} for value in startTimes]
+    newShows = [{'start_time': value} for value in startTimes]
+
+    old, expected = render(oldFormatDatetime, oldShows, args.format)
+    formatDatetime.cache_clear()
+    cold, result = render(format_datetime, newShows, args.format)
+    warm, _ = render(format_datetime, newShows, args.format)
+    assert result == expected
+
+    print('%8s %9s %12s %12s %12s %8s' % ('shows', 'distinct', 'old (s)', 'new (s)', 'warm (s)', 'speedup'))
+    print('%8d %9d %12.4f %12.4f %12.4f %7.1fx' % (args.shows, args.distinct, old, cold, warm, old / cold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Microbenchmark: city/state grouping of the /venues listing.
+
+    python -m bench.group_venues [--sizes 10000 100000 1000000] [--cities 200]
+
+Compares util.groupVenues with the filter-based reducer it replaced.
+"""
+import argparse
+import random
+import time
+from functools import reduce
+
+from fyyurEnum import stateChoices
+from util import groupVenues
+
+
+def reduceVenues(acc, item):
+    findItem = list(filter(lambda x: x['state'] == item['state'] and x['city'] == item['city'] , acc))
+    if(len(findItem) == 0):
+        newItem = {
+            'state': item['state'],
+            'city': item['city'],
+            'venues': [item]
+        }
+        acc.append(newItem)
+    else:
+        findItem[0]['venues'].append(item)
+    return acc
+
+
+def makeVenues(size, cities, seed=0):
+    rnd = random.Random(seed)
+    states = [state for state, _ in stateChoices]
+    areas = [(rnd.choice(states), 'City %d' % i) for i in range(cities)]
+    venues = []
+    for i in range(size):
+        state, city = rnd.choice(areas)
+        venues.append({
+            'id': i,
+            'name': 'Venue %d' % i,
+            'state': state,
+            'city': city,
+            'num_upcoming_shows': 0
+        })
+    return venues
+
+
+def timeit(fn, venues):
+    start = time.perf_counter()
+    result = fn(venues)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--cities', type=int, default=200)
+    args = parser.parse_args()
+
+    print('%10s %12s %12s %8s' % ('venues', 'reduce (s)', 'group (s)', 'speedup'))
+    for size in args.sizes:
+        venues = makeVenues(size, args.cities)
+        old, expected = timeit(lambda v: list(reduce(reduceVenues, v, [])), venues)
+        new, result = timeit(groupVenues, venues)
+        assert result == expected
+        print('%10d %12.4f %12.4f %7.1fx' % (size, old, new, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Request latency while logging to a slow disk.
+
+    python -m bench.logging_latency [--requests 2000] [--threads 4] [--write-ms 0.2] [--flush-ms 5]
+                                    [--queue-size 10000]
+
+Every request logs one line (TIMING is on). The log goes to a stand-in for
+a slow disk that sleeps on each write and each flush: not at all, then
+through a plain StreamHandler on the request thread, as the old FileHandler
+did, then through logs.queueLogging with each LOG_QUEUE_FULL policy. Reports p50/p95/p99 request latency in milliseconds and
+the listener's counters as JSON.
+"""
+import argparse
+import json
+import logging
+import statistics
+import threading
+import time
+import warnings
+from logging import StreamHandler
+
+from flask.logging import default_handler
+
+from bench import benchConfig
+from logs import BatchedFlush, queueLogging
+
+
+class SlowFile:
+
+    def __init__(self, writeDelay, flushDelay):
+        self.writeDelay = writeDelay
+        self.flushDelay = flushDelay
+        self.lines = 0
+
+    def write(self, text):
+        time.sleep(self.writeDelay)
+        self.lines += text.count('\n')
+
+    def flush(self):
+        time.sleep(self.flushDelay)
+
+
+class BatchedStreamHandler(BatchedFlush, StreamHandler):
+    pass
+
+
+def percentile(samples, p):
+    return statistics.quantiles(samples, n=100, method='inclusive')[p - 1]
+
+
+def drive(application, requests, threads):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        client = application.test_client()
+        own = []
+        for _ in range(count):
+            start = time.perf_counter()
+            client.get('/internal/cache').close()
+            own.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(own)
+
+    workers = [threading.Thread(target=worker, args=(requests // threads,)) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies
+
+
+def measure(mode, args):
+    from app import create_app
+
+    settings = dict(DEBUG=True, TIMING=True, CACHE_TYPE='null', SQLALCHEMY_REPLICA_URIS=[],
+                    LOG_QUEUE_SIZE=args.queue_size, LOG_BLOCK_TIMEOUT=args.block_timeout)
+    if mode.startswith('queued-'):
+        settings['LOG_QUEUE_FULL'] = mode.split('-', 1)[1]
+    application = create_app(benchConfig('sqlite://', **settings))
+    application.logger.setLevel(logging.INFO)
+    application.logger.removeHandler(default_handler)
+    disk = SlowFile(args.write_ms / 1000, args.flush_ms / 1000)
+    listener = None
+    if mode == 'sync':
+        handler = StreamHandler(disk)
+        application.logger.addHandler(handler)
+    elif mode != 'none':
+        handler = BatchedStreamHandler(disk)
+        listener = queueLogging(application, handler)
+
+    started = time.perf_counter()
+    latencies = drive(application, args.requests, args.threads)
+    elapsed = time.perf_counter() - started
+    result = {
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+    }
+    if listener is not None:
+        listener.stop()
+        result.update(listener.stats())
+    result['lines_written'] = disk.lines
+    # app.logger is shared by every app of the same name
+    for handler in list(application.logger.handlers):
+        application.logger.removeHandler(handler)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--write-ms', type=float, default=0.2)
+    parser.add_argument('--flush-ms', type=float, default=5)
+    parser.add_argument('--queue-size', type=int, default=10000)
+    parser.add_argument('--block-timeout', type=float, default=0.1)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', category=DeprecationWarning)
+    report = {mode: measure(mode, args) for mode in ('none', 'sync', 'queued-drop', 'queued-block')}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
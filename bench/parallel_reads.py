@@ -0,0 +1,101 @@
+"""Page latency with the independent queries of a page run one after
+another, and at the same time (see parallel.py).
+
+    python -m bench.parallel_reads [--database-url URL] [--requests 200] [--concurrency 4]
+                                   [--latency-ms 0]
+
+Without --database-url the data is seeded into a fresh SQLite file (see
+bench.seed); with one, the database is used as it is. --latency-ms adds a
+sleep before every statement, a stand-in for the round trip to a database
+server that a local file does not have. Reports p50/p95 in milliseconds for
+the home page and the venue and artist pages, with READ_CONCURRENCY=0 and
+with --concurrency, as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import warnings
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from bench import benchConfig
+from bench.seed import seed
+
+pages = {
+    'index': lambda rnd, ids: '/',
+    'show_venue': lambda rnd, ids: '/venues/%d' % rnd.choice(ids['venues']),
+    'show_artist': lambda rnd, ids: '/artists/%d' % rnd.choice(ids['artists']),
+}
+
+
+def percentile(samples, p):
+    return statistics.quantiles(samples, n=100, method='inclusive')[p - 1]
+
+
+def measure(application, ids, requests, seed=0):
+    client = application.test_client()
+    results = {}
+    for page, url in pages.items():
+        rnd = random.Random(seed)
+        for _ in range(10):
+            client.get(url(rnd, ids)).close()
+        latencies = []
+        for _ in range(requests):
+            path = url(rnd, ids)
+            start = time.perf_counter()
+            response = client.get(path)
+            response.get_data()
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, (path, response.status_code)
+            response.close()
+        results[page] = {'p50_ms': round(percentile(latencies, 50), 3),
+                         'p95_ms': round(percentile(latencies, 95), 3)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    from app import create_app
+    from models import Artist, Venue, db
+
+    warnings.filterwarnings('ignore', category=DeprecationWarning)
+    workdir = tempfile.mkdtemp()
+    url = args.database_url or 'sqlite:///' + os.path.join(workdir, 'bench.sqlite')
+
+    def build(concurrency):
+        return create_app(benchConfig(url, DEBUG=True, CACHE_TYPE='null', SQLALCHEMY_REPLICA_URIS=[],
+                                      READ_CONCURRENCY=concurrency))
+
+    sequential = build(0)
+    if args.database_url is None:
+        seed(sequential, args.venues, args.artists, args.shows)
+    with sequential.app_context():
+        ids = {'venues': [id for id, in db.session.query(Venue.id)],
+               'artists': [id for id, in db.session.query(Artist.id)]}
+    if args.latency_ms:
+        event.listen(Engine, 'before_cursor_execute', lambda *_: time.sleep(args.latency_ms / 1000))
+
+    report = {'database': url.split(':', 1)[0], 'latency_ms': args.latency_ms,
+              'sequential': measure(sequential, ids, args.requests),
+              'concurrent': measure(build(args.concurrency), ids, args.requests)}
+    for page, result in report['concurrent'].items():
+        result['p50_speedup'] = round(report['sequential'][page]['p50_ms'] / result['p50_ms'], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
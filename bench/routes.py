@@ -0,0 +1,282 @@
+"""Load benchmark of every route, through the Flask test client.
+
+    python -m bench.routes [--database-url URL] [--venues 1000] [--artists 2000] [--shows 50000]
+                           [--requests 200] [--warmup 10] [--cache] [--output results.json]
+                           [--baseline previous.json]
+
+Without --database-url the data is seeded into a fresh SQLite file (see
+bench.seed); with one, the database is used as it is. Every rule of the URL
+map needs a driver below, so a new route fails the run until it gets one.
+
+Reports, per route, p50/p95/p99 latency in milliseconds, SQL statements per
+request, the peak of Python allocations while serving one request, and the
+number of responses with another status than the route's (see `expected`);
+and the peak RSS of the whole run. The page cache is off unless --cache is
+given, and the static bundles are built into the run's temporary directory.
+With --baseline, the p95 ratio to an earlier report is printed to stderr.
+Exits 1 if any response had an unexpected status.
+
+This measures; it does not check behaviour, which is the tests' job
+(python -m pytest).
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timedelta
+from itertools import count
+
+from flask import current_app
+
+from assets import Build
+from bench import benchConfig
+from bench.seed import seed
+
+# endpoint -> request(rnd, ids, serial) returning (method, url, form data)
+formGenres = ['Jazz', 'Rock n Roll']
+
+def venueForm(name):
+    return {'name': 'Bench Venue %s' % name, 'city': 'San Francisco', 'state': 'CA',
+            'address': '1 Bench Street', 'phone': '', 'image_link': '', 'genres': formGenres,
+            'facebook_link': 'https://www.facebook.com/bench', 'website_link': '',
+            'seeking_description': ''}
+
+def artistForm(name):
+    return {'name': 'Bench Artist %s' % name, 'city': 'San Francisco', 'state': 'CA',
+            'phone': '', 'image_link': '', 'genres': formGenres,
+            'facebook_link': 'https://www.facebook.com/bench', 'website_link': '',
+            'seeking_description': ''}
+
+def showStart(serial):
+    # three hours apart, after the seeded shows and before the tours: each
+    # request is a booking rather than a double-booking refused
+    return (datetime(2030, 1, 1, 20) + timedelta(hours=3 * serial)).strftime('%Y-%m-%d %H:%M:%S')
+
+def tour(rnd, ids, serial):
+    # a night apiece at 50 venues, for an artist of its own in a year of its own
+    artist = rnd.choice(ids['artists'])
+    return json.dumps([{'venue_id': rnd.choice(ids['venues']), 'artist_id': artist,
+                        'start_time': '%d-%02d-%02d 20:00:00' % (2100 + serial, night // 28 + 1, night % 28 + 1)}
+                       for night in range(50)])
+
+def get(url):
+    return lambda rnd, ids, serial: ('GET', url, None)
+
+drivers = {
+    'main.index': get('/'),
+    'main.venues': get('/venues'),
+    'main.artists': get('/artists'),
+    'main.shows': get('/shows'),
+    'main.show_venue': lambda rnd, ids, serial: ('GET', '/venues/%d' % rnd.choice(ids['venues']), None),
+    'main.show_artist': lambda rnd, ids, serial: ('GET', '/artists/%d' % rnd.choice(ids['artists']), None),
+    'main.search_venues': lambda rnd, ids, serial: ('POST', '/venues/search', {'search_term': rnd.choice(['ven', 'CA', 'city 2', 'nue 1'])}),
+    'main.search_artists': lambda rnd, ids, serial: ('POST', '/artists/search', {'search_term': rnd.choice(['art', 'NY', 'city 1', 'ist 2'])}),
+    'main.create_venue_form': get('/venues/create'),
+    'main.create_artist_form': get('/artists/create'),
+    'main.create_shows': get('/shows/create'),
+    'main.create_venue_submission': lambda rnd, ids, serial: ('POST', '/venues/create', venueForm(serial)),
+    'main.create_artist_submission': lambda rnd, ids, serial: ('POST', '/artists/create', artistForm(serial)),
+    'main.create_show_submission': lambda rnd, ids, serial: ('POST', '/shows/create', {
+        'venue_id': rnd.choice(ids['venues']), 'artist_id': rnd.choice(ids['artists']),
+        'start_time': showStart(serial)}),
+    'main.create_shows_bulk': lambda rnd, ids, serial: ('POST', '/shows/bulk', tour(rnd, ids, serial)),
+    'main.edit_venue': lambda rnd, ids, serial: ('GET', '/venues/%d/edit' % rnd.choice(ids['venues']), None),
+    'main.edit_artist': lambda rnd, ids, serial: ('GET', '/artists/%d/edit' % rnd.choice(ids['artists']), None),
+    'main.export_shows_csv': get('/shows/export.csv?from=2030-01-01'),
+    'main.export_shows_ndjson': get('/shows/export.ndjson?from=2030-01-01'),
+    'main.cache_stats': get('/internal/cache'),
+    'main.pool_stats': get('/internal/pool'),
+    'main.logging_stats': get('/internal/logging'),
+    'main.autocomplete_stats': get('/internal/autocomplete'),
+    'main.autocomplete': lambda rnd, ids, serial: ('GET', '/autocomplete?q=%s' % rnd.choice(['v', 'Ve', 'art', 'Artist 1', 'venue 12']), None),
+    'api.venues': get('/api/v1/venues'),
+    'api.artists': get('/api/v1/artists'),
+    'api.shows': get('/api/v1/shows'),
+    'api.venue': lambda rnd, ids, serial: ('GET', '/api/v1/venues/%d' % rnd.choice(ids['venues']), None),
+    'api.artist': lambda rnd, ids, serial: ('GET', '/api/v1/artists/%d' % rnd.choice(ids['artists']), None),
+    'static': get('/static/css/main.css'),
+    'assets': lambda rnd, ids, serial: ('GET', '/static/dist/' + current_app.extensions['assets']['main.css'], None),
+}
+
+# the status a route answers its driver's request with, when not 200
+expected = {
+    'main.create_venue_submission': 302,
+    'main.create_artist_submission': 302,
+    'main.create_show_submission': 302,
+    'main.create_shows_bulk': 201,
+    'main.edit_venue_submission': 302,
+    'main.edit_artist_submission': 302,
+    'main.delete_venue': 302,
+}
+
+# routes that change or delete a row get one of the bench's own, created
+# outside of the timing: setup(client, serial) -> (method, url, form data)
+
+def ownVenue(client, serial):
+    from models import Venue
+    client.post('/venues/create', data=venueForm('own %d' % serial))
+    return Venue.query.filter_by(name='Bench Venue own %d' % serial).one().id
+
+def ownArtist(client, serial):
+    from models import Artist
+    client.post('/artists/create', data=artistForm('own %d' % serial))
+    return Artist.query.filter_by(name='Bench Artist own %d' % serial).one().id
+
+setups = {
+    'main.edit_venue_submission': lambda client, serial: (
+        'POST', '/venues/%d/edit' % ownVenue(client, serial), venueForm('edited %d' % serial)),
+    'main.edit_artist_submission': lambda client, serial: (
+        'POST', '/artists/%d/edit' % ownArtist(client, serial), artistForm('edited %d' % serial)),
+    'main.delete_venue': lambda client, serial: ('DELETE', '/venues/%d' % ownVenue(client, serial), None),
+}
+
+
+def percentile(samples, p):
+    return statistics.quantiles(samples, n=100, method='inclusive')[p - 1] if len(samples) > 1 else samples[0]
+
+
+def send(client, method, url, data):
+    response = client.open(url, method=method, data=data,
+                           content_type='application/json' if isinstance(data, str) else None)
+    response.get_data()
+    response.close()
+    return response.status_code
+
+
+def run(application, ids, requests, warmup, seed=0):
+    from sqlalchemy import event
+
+    from models import db
+
+    rnd = random.Random(seed)
+    serial = count(1)
+    rules = sorted({rule.endpoint for rule in application.url_map.iter_rules()})
+    missing = [endpoint for endpoint in rules if endpoint not in drivers and endpoint not in setups]
+    if missing:
+        raise SystemExit('no driver for %s' % ', '.join(missing))
+
+    statements = [0]
+    results = {}
+    with application.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.__setitem__(0, statements[0] + 1))
+        client = application.test_client()
+        for endpoint in rules:
+            def makeRequest():
+                if endpoint in setups:
+                    return setups[endpoint](client, next(serial))
+                return drivers[endpoint](rnd, ids, next(serial))
+
+            for _ in range(warmup):
+                send(client, *makeRequest())
+            latencies = []
+            queries = []
+            errors = 0
+            for _ in range(requests):
+                request = makeRequest()
+                statements[0] = 0
+                start = time.perf_counter()
+                status = send(client, *request)
+                latencies.append((time.perf_counter() - start) * 1000)
+                queries.append(statements[0])
+                errors += status != expected.get(endpoint, 200)
+
+            request = makeRequest()
+            tracemalloc.start()
+            send(client, *request)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[endpoint] = {
+                'method': request[0],
+                'url': request[1],
+                'requests': requests,
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'queries': round(statistics.mean(queries), 2),
+                'peak_alloc_kb': peak // 1024,
+                'errors': errors,
+            }
+    return results
+
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', action='store_true', help='keep the page cache on')
+    parser.add_argument('--output', help='write the report here instead of stdout')
+    parser.add_argument('--baseline', help='an earlier report to compare p95 latencies with')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    # the app's own deprecation warnings would fire on every request
+    warnings.filterwarnings('ignore', category=DeprecationWarning)
+    # outside of debug mode create_app() logs to ./error.log; keep it out of the tree
+    output, baseline = (os.path.abspath(path) if path else None for path in (args.output, args.baseline))
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    url = args.database_url or 'sqlite:///' + os.path.join(workdir, 'bench.sqlite')
+    assetsDir = os.path.join(workdir, 'dist')
+    Build(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static'), assetsDir).run()
+    application = create_app(benchConfig(url, DEBUG=False, CACHE_TYPE='lru' if args.cache else 'null',
+                                         SQLALCHEMY_REPLICA_URIS=[], ASSETS_DIR=assetsDir))
+    if args.database_url is None:
+        seed(application, args.venues, args.artists, args.shows, args.seed)
+    from models import Artist, Show, Venue, db
+    with application.app_context():
+        volumes = {'venues': Venue.query.count(), 'artists': Artist.query.count(), 'shows': Show.query.count()}
+        ids = {'venues': [id for id, in db.session.query(Venue.id)],
+               'artists': [id for id, in db.session.query(Artist.id)]}
+
+    routes = run(application, ids, args.requests, args.warmup, args.seed)
+    report = {
+        'revision': revision(),
+        'database': url.split(':', 1)[0],
+        'volumes': volumes,
+        'cache': args.cache,
+        'routes': routes,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if baseline:
+        with open(baseline) as f:
+            baseline = json.load(f)['routes']
+        for endpoint, result in routes.items():
+            if endpoint in baseline:
+                print('%-34s p95 %8.2f ms  %5.2fx' % (endpoint, result['p95_ms'],
+                      result['p95_ms'] / max(baseline[endpoint]['p95_ms'], 1e-9)), file=sys.stderr)
+    if any(result['errors'] for result in routes.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
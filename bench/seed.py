@@ -0,0 +1,165 @@
+"""Synthetic data for the benchmarks.
+
+    python -m bench.seed --database-url sqlite:///bench.sqlite [--venues 1000] [--artists 2000] [--shows 50000] [--seed 0]
+
+Venues and artists are spread over the states of fyyurEnum in proportion
+to population, over a handful of cities per state, and get one to three
+genres with a long-tailed popularity. Shows pick their venue and artist
+with a Zipf-like skew, start in the evening, and span a year either side
+of now. The same seed gives the same rows.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from fyyurEnum import genresChoices, stateChoices
+
+# 2020 census, in hundreds of thousands
+POPULATION = {
+    'AL': 50, 'AK': 7, 'AZ': 72, 'AR': 30, 'CA': 395, 'CO': 58, 'CT': 36, 'DE': 10,
+    'DC': 7, 'FL': 215, 'GA': 107, 'HI': 15, 'ID': 18, 'IL': 128, 'IN': 68, 'IA': 32,
+    'KS': 29, 'KY': 45, 'LA': 47, 'ME': 14, 'MT': 11, 'NE': 20, 'NV': 31, 'NH': 14,
+    'NJ': 93, 'NM': 21, 'NY': 202, 'NC': 104, 'ND': 8, 'OH': 118, 'OK': 40, 'OR': 42,
+    'MD': 62, 'MA': 70, 'MI': 101, 'MN': 57, 'MS': 30, 'MO': 62, 'PA': 130, 'RI': 11,
+    'SC': 51, 'SD': 9, 'TN': 69, 'TX': 291, 'UT': 33, 'VT': 6, 'VA': 86, 'WA': 77,
+    'WV': 18, 'WI': 59, 'WY': 6,
+}
+CITIES_PER_STATE = 5
+CHUNK = 5000
+
+
+def zipf(count, exponent=1.0):
+    # cumulative weights of ranks 1..count
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class Generator:
+
+    def __init__(self, seed=0):
+        self.rnd = random.Random(seed)
+        self.states = [state for state, _ in stateChoices]
+        self.stateWeights = list(accumulate(POPULATION.get(state, 10) for state in self.states))
+        self.genres = [genre for genre, _ in genresChoices]
+        self.rnd.shuffle(self.genres)
+        self.genreWeights = zipf(len(self.genres), 0.8)
+        self.cityWeights = zipf(CITIES_PER_STATE)
+
+    def place(self):
+        state = self.rnd.choices(self.states, cum_weights=self.stateWeights)[0]
+        city = self.rnd.choices(range(CITIES_PER_STATE), cum_weights=self.cityWeights)[0]
+        return state, '%s City %d' % (state, city + 1)
+
+    def genresOf(self):
+        count = self.rnd.choices([1, 2, 3], weights=[5, 3, 1])[0]
+        return sorted(set(self.rnd.choices(self.genres, cum_weights=self.genreWeights, k=count)))
+
+    def owner(self, id, kind):
+        state, city = self.place()
+        row = {
+            'id': id,
+            'name': '%s %d' % (kind, id),
+            'city': city,
+            'state': state,
+            'phone': '%03d-%03d-%04d' % (self.rnd.randrange(200, 999), self.rnd.randrange(1000), self.rnd.randrange(10000)),
+            'image_link': 'https://images.example.com/%s/%d.jpg' % (kind.lower(), id),
+            'facebook_link': 'https://www.facebook.com/%s%d' % (kind.lower(), id),
+            'website': 'https://%s%d.example.com' % (kind.lower(), id),
+            'seeking_description': None,
+        }
+        seeking = self.rnd.random() < 0.3
+        if kind == 'Venue':
+            row.update(address='%d Main Street' % self.rnd.randrange(1, 2000), seeking_talent=seeking)
+        else:
+            row.update(seeking_venue=seeking)
+        if seeking:
+            row['seeking_description'] = 'Looking for %s acts.' % self.rnd.choice(self.genres)
+        return row
+
+    def shows(self, count, venues, artists, now):
+        venueWeights = zipf(venues, 0.7)
+        artistWeights = zipf(artists, 0.7)
+        # popularity should not follow the id order
+        venueIds = self.rnd.sample(range(1, venues + 1), venues)
+        artistIds = self.rnd.sample(range(1, artists + 1), artists)
+        for id in range(1, count + 1):
+            day = now.date() + timedelta(days=self.rnd.randrange(-365, 366))
+            start = datetime.combine(day, datetime.min.time()) + timedelta(
+                hours=self.rnd.choice([18, 19, 20, 20, 21, 21, 22]), minutes=self.rnd.choice([0, 0, 30]))
+            yield {
+                'id': id,
+                'venue_id': venueIds[self.rnd.choices(range(venues), cum_weights=venueWeights)[0]],
+                'artist_id': artistIds[self.rnd.choices(range(artists), cum_weights=artistWeights)[0]],
+                'start_time': start,
+            }
+
+
+def insertChunks(connection, table, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK:
+            connection.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        connection.execute(table.insert(), chunk)
+
+
+def seed(application, venues=1000, artists=2000, shows=50000, seed=0):
+    """Create the schema and fill it; returns the volumes inserted."""
+    from flask_migrate import upgrade
+    from sqlalchemy import select
+
+    from app import showCounters
+    from models import Artist, ArtistGenre, Genre, Show, Venue, VenueGenre, db
+
+    generator = Generator(seed)
+    now = datetime.now()
+    with application.app_context():
+        upgrade(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations'))
+        connection = db.session.connection()
+        # the migrations list the form's genres already
+        listed = set(connection.execute(select(Genre.name)).scalars())
+        missing = [{'name': name} for name in sorted(generator.genres) if name not in listed]
+        if missing:
+            connection.execute(Genre.__table__.insert(), missing)
+        genreIds = dict(connection.execute(select(Genre.name, Genre.id)).all())
+
+        for model, table, key, kind, count in ((Venue, VenueGenre, 'venue_id', 'Venue', venues),
+                                               (Artist, ArtistGenre, 'artist_id', 'Artist', artists)):
+            owners = [generator.owner(id, kind) for id in range(1, count + 1)]
+            insertChunks(connection, model.__table__, owners)
+            insertChunks(connection, table, ({key: owner['id'], 'genre_id': genreIds[genre]}
+                                             for owner in owners for genre in generator.genresOf()))
+
+        insertChunks(connection, Show.__table__, generator.shows(shows, venues, artists, now))
+        showCounters.rebuild(connection, now)
+        if db.engine.dialect.name == 'postgresql':
+            for model in (Venue, Artist, Show):
+                connection.exec_driver_sql(
+                    'SELECT setval(pg_get_serial_sequence(\'"{0}"\', \'id\'), '
+                    '(SELECT max(id) FROM "{0}"))'.format(model.__tablename__))
+        db.session.commit()
+    return {'venues': venues, 'artists': artists, 'shows': shows, 'seed': seed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from app import create_app
+    from bench import benchConfig
+
+    application = create_app(benchConfig(args.database_url))
+    print(json.dumps(seed(application, args.venues, args.artists, args.shows, args.seed)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Worker boot time: import, create_app() and the first request.
+
+    python -m bench.startup [--runs 10] [--database-url sqlite:///...]
+
+Every run is a fresh interpreter, as a prefork server's worker would be.
+Prints the median of each phase in milliseconds as JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench import benchConfig
+
+WORKER = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+from bench import benchConfig
+application = app.create_app(benchConfig(sys.argv[1]))
+created = time.perf_counter()
+application.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'import': (imported - start) * 1000,
+    'create_app': (created - imported) * 1000,
+    'first_request': (served - created) * 1000,
+    'total': (served - start) * 1000,
+}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    url = args.database_url
+    if url is None:
+        path = os.path.join(tempfile.mkdtemp(), 'startup.sqlite')
+        url = 'sqlite:///' + path
+        from flask_migrate import upgrade
+
+        from app import create_app
+        with create_app(benchConfig(url)).app_context():
+            upgrade(os.path.join(root, 'migrations'))
+
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, '-c', WORKER, url], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.splitlines()[-1]))
+
+    print(json.dumps({
+        phase: round(statistics.median(sample[phase] for sample in samples), 2)
+        for phase in samples[0]
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
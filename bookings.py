@@ -0,0 +1,104 @@
+from bisect import bisect_left
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import select
+
+from models import Show
+
+# Double-booking checks: no two shows of a venue, or of an artist, may
+# overlap in [start_time, end_time). On Postgres the exclusion constraints
+# of the Show table enforce it (see migrations/); elsewhere nothing in the
+# database does. Either way every path that lists shows checks first, so it
+# can say which shows clash instead of failing on the constraint.
+#
+# No show lasts more than SHOW_MAX_MINUTES, so the booked shows that can
+# overlap a set of new ones all start within one window, read through the
+# (venue_id, start_time) and (artist_id, start_time) indexes. Shows without
+# an end_time (see models.Show) are not checked.
+
+OWNERS = (('venue_id', Show.venue_id), ('artist_id', Show.artist_id))
+TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+class Timeline:
+    """The booked intervals of one venue or artist. They never overlap, so
+    sorted by start they are sorted by end too, and of those starting
+    before a given end only the last one can reach past a given start."""
+
+    def __init__(self):
+        self.starts = []
+        self.intervals = []
+
+    def clash(self, start, end):
+        i = bisect_left(self.starts, end) - 1
+        if i >= 0 and self.intervals[i][1] > start:
+            booked, ends, show = self.intervals[i]
+            return dict(show, start_time=booked, end_time=ends)
+        return None
+
+    def add(self, start, end, show):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.intervals.insert(i, (start, end, show))
+
+
+def showEnd(start, end=None):
+    """The end of a show starting at `start`: `end`, or the default length
+    after `start`. Raises ValueError for a show that is too long."""
+    config = current_app.config
+    if end is None:
+        end = start + timedelta(minutes=config['SHOW_DEFAULT_MINUTES'])
+    if end - start > timedelta(minutes=config['SHOW_MAX_MINUTES']):
+        raise ValueError('A show can last at most %d minutes.' % config['SHOW_MAX_MINUTES'])
+    return end
+
+
+def conflicts(connection, shows):
+    """The overlaps of `shows`, (ref, venue_id, artist_id, start_time,
+    end_time) tuples, with the booked shows and with each other.
+
+    One pass in start order: a show that overlaps is left out, so the ones
+    after it are checked against the shows that would actually be booked.
+    Each overlap is {'ref', 'venue_id' or 'artist_id', 'with'}, where
+    'with' has the other show's 'show_id' (or 'ref') and its times.
+    """
+    if not shows:
+        return []
+    longest = timedelta(minutes=current_app.config['SHOW_MAX_MINUTES'])
+    since = min(show[3] for show in shows) - longest
+    until = max(show[4] for show in shows)
+    timelines = {}
+    for position, (name, key) in enumerate(OWNERS, 1):
+        ids = {show[position] for show in shows}
+        timelines[name] = {id: Timeline() for id in ids}
+        booked = connection.execute(
+            select(Show.id, key, Show.start_time, Show.end_time)
+            .where(key.in_(ids), Show.end_time != None, Show.start_time > since, Show.start_time < until)
+            .order_by(key, Show.start_time))
+        for id, owner, start, end in booked:
+            timelines[name][owner].add(start, end, {'show_id': id})
+
+    found = []
+    for ref, venueId, artistId, start, end in sorted(shows, key=lambda show: show[3]):
+        owners = (('venue_id', venueId), ('artist_id', artistId))
+        clashes = []
+        for name, id in owners:
+            other = timelines[name][id].clash(start, end)
+            if other:
+                clashes.append({'ref': ref, name: id, 'with': other})
+        if clashes:
+            found.extend(clashes)
+            continue
+        for name, id in owners:
+            timelines[name][id].add(start, end, {'ref': ref})
+    return found
+
+
+def describe(conflict):
+    name = 'venue_id' if 'venue_id' in conflict else 'artist_id'
+    other = conflict['with']
+    return '%s %d is booked from %s to %s by %s' % (
+        name.split('_')[0], conflict[name], other['start_time'].strftime(TIME_FORMAT),
+        other['end_time'].strftime(TIME_FORMAT),
+        'show %d' % other['show_id'] if 'show_id' in other else 'entry %s' % other['ref'])
@@ -0,0 +1,322 @@
+import csv
+import io
+import json
+import time
+
+from sqlalchemy import select
+from werkzeug.datastructures import MultiDict
+
+from bookings import conflicts, describe, showEnd
+from forms import ArtistForm, ShowForm, VenueForm
+from models import Artist, ArtistGenre, Genre, Show, Venue, VenueGenre, insertGenres
+
+# Bulk import/export of venues, artists and shows as CSV or NDJSON, behind
+# `flask fyyur import|export`. Files are read and written `chunkSize` rows
+# at a time, so memory is bounded by the chunk rather than the file.
+#
+# Rows use the field names of the create forms plus an optional `id`, and
+# are checked by the same forms; in CSV, genres are separated by ';'. Rows
+# that fail are reported and skipped, and so are shows that would double-book
+# a venue or an artist (see bookings.py). Each chunk of valid rows goes in
+# with COPY on Postgres and an executemany INSERT elsewhere, then commits.
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'  # what DateTimeField parses
+COPY_NULL = '\\N'
+
+
+class Kind:
+
+    def __init__(self, model, form, columns, genres=None):
+        self.model = model
+        self.table = model.__table__
+        self.form = form
+        # form field -> column name, in file order
+        self.columns = columns
+        # (association table, its key column name), for kinds with genres
+        self.genres = genres
+        self.fields = ['id'] + list(columns) + (['genres'] if genres else [])
+
+
+kinds = {
+    'venues': Kind(Venue, VenueForm, {
+        'name': 'name', 'city': 'city', 'state': 'state', 'address': 'address',
+        'phone': 'phone', 'image_link': 'image_link', 'facebook_link': 'facebook_link',
+        'website_link': 'website', 'seeking_talent': 'seeking_talent',
+        'seeking_description': 'seeking_description'
+    }, (VenueGenre, 'venue_id')),
+    'artists': Kind(Artist, ArtistForm, {
+        'name': 'name', 'city': 'city', 'state': 'state', 'phone': 'phone',
+        'image_link': 'image_link', 'facebook_link': 'facebook_link',
+        'website_link': 'website', 'seeking_venue': 'seeking_venue',
+        'seeking_description': 'seeking_description'
+    }, (ArtistGenre, 'artist_id')),
+    'shows': Kind(Show, ShowForm, {
+        'venue_id': 'venue_id', 'artist_id': 'artist_id', 'start_time': 'start_time',
+        'end_time': 'end_time'
+    }),
+}
+
+
+def formatOf(filename, format=None):
+    if format:
+        return format
+    return 'ndjson' if filename.endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def readRows(stream, format):
+    # (line number, row) pairs; a line that is not JSON comes back as None
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def formData(row):
+    data = MultiDict()
+    for name, value in row.items():
+        if name == 'genres':
+            for genre in value.split(';') if isinstance(value, str) else value or []:
+                if genre:
+                    data.add(name, genre)
+        elif isinstance(value, bool):
+            data.add(name, 'true' if value else 'false')
+        elif value is not None:
+            data.add(name, str(value))
+    return data
+
+
+def existing(connection, column, values):
+    # those of `values` that `column` holds
+    if not values:
+        return set()
+    return set(connection.execute(select(column).where(column.in_(values))).scalars())
+
+
+class Importer:
+
+    def __init__(self, session, kind, chunkSize=10000, onReject=None):
+        self.session = session
+        self.kind = kind
+        self.chunkSize = chunkSize
+        self.onReject = onReject or (lambda number, message: None)
+        self.form = kind.form(formdata=None, meta={'csrf': False})
+        self.genreIds = None
+        self.explicitIds = False
+        # the overlaps that rejected shows, see bookings.conflicts
+        self.conflicts = []
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.started = time.perf_counter()
+
+    def reject(self, number, message):
+        self.rejected += 1
+        self.onReject(number, message)
+
+    def check(self, number, row):
+        """The row's column values and genres, or None once rejected."""
+        if row is None:
+            return self.reject(number, 'not a JSON object')
+        form = self.form
+        form.process(formData(row))
+        if not form.validate():
+            return self.reject(number, '; '.join(
+                '%s: %s' % (name, ' '.join(errors)) for name, errors in form.errors.items()))
+        values = {column: form[field].data for field, column in self.kind.columns.items()}
+        if self.kind.model is Show:
+            # the form leaves these to the view: ids must be numbers, and a
+            # missing start time must not fall back to the field's default
+            if not form.start_time.raw_data:
+                return self.reject(number, 'start_time: This field is required.')
+            try:
+                values['venue_id'] = int(values['venue_id'])
+                values['artist_id'] = int(values['artist_id'])
+            except (TypeError, ValueError):
+                return self.reject(number, 'venue_id and artist_id must be numbers')
+            try:
+                values['end_time'] = showEnd(values['start_time'], values['end_time'])
+            except ValueError as e:
+                return self.reject(number, 'end_time: %s' % e)
+        if row.get('id') not in (None, ''):
+            try:
+                values['id'] = int(row['id'])
+            except (TypeError, ValueError):
+                return self.reject(number, 'id must be a number')
+        return number, values, form.genres.data if self.kind.genres else None
+
+    def run(self, rows, onChunk=None):
+        chunk = []
+        for number, row in rows:
+            self.read += 1
+            checked = self.check(number, row)
+            if checked is not None:
+                chunk.append(checked)
+            if len(chunk) >= self.chunkSize:
+                self.load(chunk)
+                chunk = []
+                if onChunk:
+                    onChunk(self)
+        if chunk:
+            self.load(chunk)
+        self.finish()
+        if onChunk:
+            onChunk(self)
+
+    def load(self, chunk):
+        connection = self.session.connection()
+        chunk = self.checkChunk(connection, chunk)
+        if chunk:
+            # executemany needs the same keys on every row
+            withIds = [values for _, values, _ in chunk if 'id' in values]
+            withoutIds = [values for _, values, _ in chunk if 'id' not in values]
+            for rows in (withIds, withoutIds):
+                if rows:
+                    insertRows(connection, self.kind.table, rows)
+            self.explicitIds = self.explicitIds or bool(withIds)
+            if self.kind.genres:
+                self.insertGenres(connection, chunk)
+            self.imported += len(chunk)
+        self.session.commit()
+
+    def checkChunk(self, connection, chunk):
+        # what the database would refuse, checked a chunk at a time so a
+        # single bad row does not fail the whole COPY
+        model = self.kind.model
+        if self.kind.genres:
+            unique = [('name', model.name), ('id', model.id)]
+        else:
+            unique = [('id', model.id)]
+            venues = existing(connection, Venue.id, {values['venue_id'] for _, values, _ in chunk})
+            artists = existing(connection, Artist.id, {values['artist_id'] for _, values, _ in chunk})
+        taken = {key: existing(connection, column, {values[key] for _, values, _ in chunk if key in values})
+                 for key, column in unique}
+        accepted = []
+        for number, values, genres in chunk:
+            clash = [key for key, _ in unique if key in values and values[key] in taken[key]]
+            if clash:
+                self.reject(number, '%s %r already exists' % (clash[0], values[clash[0]]))
+                continue
+            if not self.kind.genres:
+                if values['venue_id'] not in venues:
+                    self.reject(number, 'no venue with id %d' % values['venue_id'])
+                    continue
+                if values['artist_id'] not in artists:
+                    self.reject(number, 'no artist with id %d' % values['artist_id'])
+                    continue
+            for key, _ in unique:
+                if key in values:
+                    taken[key].add(values[key])
+            accepted.append((number, values, genres))
+        if not self.kind.genres:
+            accepted = self.checkBookings(connection, accepted)
+        return accepted
+
+    def checkBookings(self, connection, chunk):
+        overlaps = conflicts(connection, [(number, values['venue_id'], values['artist_id'],
+                                           values['start_time'], values['end_time'])
+                                          for number, values, _ in chunk])
+        messages = {}
+        for conflict in overlaps:
+            messages.setdefault(conflict['ref'], []).append(describe(conflict))
+        for number, message in sorted(messages.items()):
+            self.reject(number, '; '.join(message))
+        self.conflicts.extend(overlaps)
+        return [row for row in chunk if row[0] not in messages]
+
+    def insertGenres(self, connection, chunk):
+        model = self.kind.model
+        table, key = self.kind.genres
+        if self.genreIds is None:
+            self.genreIds = dict(connection.execute(select(Genre.name, Genre.id)).all())
+        missing = {genre for _, _, genres in chunk for genre in genres} - set(self.genreIds)
+        if missing:
+            insertGenres(connection, sorted(missing))
+            self.genreIds.update(connection.execute(
+                select(Genre.name, Genre.id).where(Genre.name.in_(missing))).all())
+        ids = dict(connection.execute(
+            select(model.name, model.id).where(model.name.in_([values['name'] for _, values, _ in chunk]))).all())
+        rows = [{key: ids[values['name']], 'genre_id': self.genreIds[genre]}
+                for _, values, genres in chunk for genre in dict.fromkeys(genres)]
+        if rows:
+            insertRows(connection, table, rows)
+
+    def finish(self):
+        connection = self.session.connection()
+        if self.explicitIds and connection.dialect.name == 'postgresql':
+            # ids given in the file leave the sequence behind
+            table = self.kind.table.name
+            connection.exec_driver_sql(
+                'SELECT setval(pg_get_serial_sequence(\'"%s"\', \'id\'), '
+                'coalesce((SELECT max(id) FROM "%s"), 0) + 1, false)' % (table, table))
+        self.session.commit()
+
+    def rate(self):
+        return self.read / max(time.perf_counter() - self.started, 1e-9)
+
+
+def insertRows(connection, table, rows):
+    if connection.dialect.name != 'postgresql':
+        connection.execute(table.insert(), rows)
+        return
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([COPY_NULL if row[column] is None else row[column] for column in columns])
+    buffer.seek(0)
+    # the psycopg2 connection under the session's
+    cursor = connection.connection.cursor()
+    cursor.copy_expert('COPY "%s" (%s) FROM STDIN WITH (FORMAT csv, NULL \'%s\')'
+                       % (table.name, ', '.join(columns), COPY_NULL), buffer)
+
+
+def exportRows(connection, kind, chunkSize=10000):
+    """The rows of `kind` in id order, in the import format, read through a
+    server-side cursor `chunkSize` rows at a time."""
+    model = kind.model
+    columns = [model.id] + [getattr(model, column) for column in kind.columns.values()]
+    result = connection.execution_options(stream_results=True).execute(
+        select(*columns).order_by(model.id))
+    for rows in result.partitions(chunkSize):
+        genres = {}
+        if kind.genres:
+            table, key = kind.genres
+            query = select(table.c[key], Genre.name).join(Genre, table.c.genre_id == Genre.id) \
+                .where(table.c[key].in_([row.id for row in rows])).order_by(table.c[key], Genre.name)
+            for id, name in connection.execute(query):
+                genres.setdefault(id, []).append(name)
+        for row in rows:
+            data = {'id': row.id}
+            for field, column in kind.columns.items():
+                value = getattr(row, column)
+                data[field] = value.strftime(DATETIME_FORMAT) if column in ('start_time', 'end_time') and value else value
+            if kind.genres:
+                data['genres'] = genres.get(row.id, [])
+            yield data
+
+
+def writeRows(stream, format, kind, rows):
+    """Write `rows` to `stream`; returns the number written."""
+    count = 0
+    if format == 'csv':
+        writer = csv.DictWriter(stream, kind.fields)
+        writer.writeheader()
+    for row in rows:
+        if format == 'csv':
+            row = {name: ';'.join(value) if name == 'genres'
+                   else ('true' if value else 'false') if isinstance(value, bool) else value
+                   for name, value in row.items()}
+            writer.writerow(row)
+        else:
+            stream.write(json.dumps(row, separators=(',', ':')) + '\n')
+        count += 1
+    return count
@@ -0,0 +1,260 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, g, make_response, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from werkzeug.http import is_resource_modified
+
+# Page cache for the read-heavy GET views.
+#
+# Entries are keyed on the request path and query string plus the current
+# version of every tag the view declares (e.g. 'venue:3', 'venues', 'home').
+# A commit that touched a row bumps the versions of the tags that row feeds,
+# so only the affected pages miss on their next request; stale entries are
+# never read again and age out of the backend. The backend and the counters
+# are per app, in app.extensions['pageCache'].
+
+
+class LRUCache:
+    """In-process backend: least recently used entries are dropped beyond
+    `maxsize`, and every entry expires after `timeout` seconds."""
+
+    def __init__(self, maxsize=1024, timeout=300):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=-1):
+        timeout = self.timeout if timeout == -1 else timeout
+        expires = time.time() + timeout if timeout else None
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class FileCache:
+    """Backend shared by every worker on the host: one pickle per key under
+    `directory`, written atomically."""
+
+    def __init__(self, directory, timeout=300):
+        self.directory = directory
+        self.timeout = timeout
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires is not None and expires < time.time():
+            return None
+        return value
+
+    def set(self, key, value, timeout=-1):
+        timeout = self.timeout if timeout == -1 else timeout
+        expires = time.time() + timeout if timeout else None
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((expires, value), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+
+
+class NullCache:
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=-1):
+        pass
+
+    def clear(self):
+        pass
+
+
+def createBackend(config):
+    kind = config.get('CACHE_TYPE', 'lru')
+    timeout = config.get('CACHE_DEFAULT_TIMEOUT', 300)
+    if kind == 'lru':
+        return LRUCache(config.get('CACHE_MAXSIZE', 1024), timeout)
+    if kind == 'file':
+        return FileCache(config['CACHE_DIR'], timeout)
+    if kind == 'null':
+        return NullCache()
+    raise ValueError('Unknown CACHE_TYPE %r' % kind)
+
+
+class PageStore:
+    """An app's backend and counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+
+class PageCache:
+
+    def __init__(self, backend=None):
+        # a backend for every app, rather than one per app from its config
+        self.backend = backend
+
+    def init_app(self, app):
+        app.extensions['pageCache'] = PageStore(self.backend or createBackend(app.config))
+
+    def store(self):
+        return current_app.extensions['pageCache']
+
+    def stats(self):
+        store = self.store()
+        return {
+            'backend': type(store.backend).__name__,
+            'hits': store.hits,
+            'misses': store.misses,
+            'invalidations': store.invalidations
+        }
+
+    def version(self, tag):
+        version = self.store().backend.get('tag:' + tag)
+        if version is None:
+            # never bumped, or evicted: any entry made under an older version
+            # must not come back, so start from a fresh one
+            version = self.bump(tag)
+        return version
+
+    def bump(self, tag):
+        version = uuid.uuid4().hex
+        self.store().backend.set('tag:' + tag, version, timeout=0)
+        return version
+
+    def invalidate(self, tags):
+        for tag in tags:
+            self.bump(tag)
+        self.store().invalidations += len(tags)
+
+    def clear(self):
+        """Drop every page and tag version, e.g. after a bulk load."""
+        store = self.store()
+        store.backend.clear()
+        store.invalidations += 1
+
+    def cached(self, tags):
+        """Cache the view's 200 responses under the tags `tags(**view_args)`
+        returns. Requests with pending flash messages bypass the cache."""
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if '_flashes' in session:
+                    return view(**kwargs)
+                viewTags = sorted(tags(**kwargs))
+                # under @conditional, the page is also keyed on its validator,
+                # so a page rendered before the rows moved never comes back
+                # under a newer ETag, however the change got past the tags
+                key = 'page:%s|%s|%s' % (request.full_path, g.get('page_etag', ''),
+                                         '|'.join(self.version(tag) for tag in viewTags))
+                store = self.store()
+                page = store.backend.get(key)
+                if page is not None:
+                    store.hits += 1
+                    body, mimetype = page
+                    return Response(body, mimetype=mimetype)
+                store.misses += 1
+                response = view(**kwargs)
+                if isinstance(response, str):
+                    response = Response(response)
+                if isinstance(response, Response) and response.status_code == 200 and not response.is_streamed:
+                    store.backend.set(key, (response.get_data(), response.mimetype))
+                return response
+            return wrapper
+        return decorator
+
+    def watch(self, model, tags):
+        """Invalidate `tags(connection, row)` once a transaction that inserted,
+        updated or deleted a `model` row commits. Deletes are seen before the
+        DELETE runs, while rows that cascade from it can still be read."""
+
+        def touched(mapper, connection, target):
+            pending = object_session(target).info.setdefault('cache_tags', set())
+            pending.update(tags(connection, target))
+
+        for name in ('after_insert', 'after_update', 'before_delete'):
+            event.listen(model, name, touched)
+
+    def watchCommits(self, dbSession):
+        @event.listens_for(dbSession, 'after_commit')
+        def afterCommit(dbSession):
+            tags = dbSession.info.pop('cache_tags', None)
+            if tags:
+                self.invalidate(tags)
+
+        @event.listens_for(dbSession, 'after_rollback')
+        def afterRollback(dbSession):
+            dbSession.info.pop('cache_tags', None)
+
+
+def conditional(version):
+    """Validate GETs against `version(**view_args)`, a (last modified, key)
+    pair the view's rows cannot change without changing. A matching
+    If-None-Match gets a 304 before the view runs; a None version (e.g. an
+    unknown id) or pending flash messages skip the check.
+
+    If-Modified-Since is not honoured: a delete does not move the newest
+    updated_at, only the ETag."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            current = None if '_flashes' in session else version(**kwargs)
+            if current is None:
+                return view(**kwargs)
+            lastModified, key = current
+            etag = hashlib.sha1(repr((request.full_path, lastModified, key)).encode()).hexdigest()
+            g.page_etag = etag
+            if not is_resource_modified(request.environ, etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+            # revalidate on every use rather than trusting a heuristic lifetime
+            response.set_etag(etag, weak=True)
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
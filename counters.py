@@ -0,0 +1,143 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, event, exists, func, inspect, select, true, update
+from sqlalchemy.orm import object_session
+
+# Denormalized upcoming/past show counters on the owners of a show (Venue and
+# Artist). Each owner row carries `counts_as_of`: its counters classify shows
+# as upcoming or past relative to that instant, not to the current time.
+# Writes keep them exact relative to it, and rollover() moves it forward for
+# the owners whose shows started in the meantime. Every counter change also
+# moves the owner's `updated_at`, which the page validators read. The shows
+# written by a flush are counted together once it is over, one UPDATE per
+# owner row they touch.
+
+
+class ShowCounters:
+
+    def __init__(self, show, owners):
+        # owners: (model, Show foreign key column) pairs
+        self.show = show
+        self.owners = owners
+        self.columns = ['start_time'] + [key.key for _, key in owners]
+
+    def watch(self, session):
+        event.listen(self.show, 'after_insert', self.showInserted)
+        event.listen(self.show, 'after_update', self.showUpdated)
+        event.listen(self.show, 'after_delete', self.showDeleted)
+        for owner, key in self.owners:
+            event.listen(owner, 'before_delete', self.ownerDeleted(owner, key))
+
+        @event.listens_for(session, 'after_flush')
+        def afterFlush(session, context):
+            changes = session.info.pop('show_counts', None)
+            if changes:
+                self.adjust(session.connection(), changes)
+
+        @event.listens_for(session, 'after_rollback')
+        def afterRollback(session):
+            session.info.pop('show_counts', None)
+
+    def adjust(self, connection, changes):
+        # changes: (Show column name -> value, +1 or -1) per show counted in
+        # or out. A show is upcoming for an owner whose counts_as_of is at
+        # or before its start, so with the starts sorted, counts_as_of at or
+        # before the i-th one makes that show and the later ones upcoming.
+        for owner, key in self.owners:
+            shows = defaultdict(list)
+            for values, delta in changes:
+                if values['start_time'] is not None:
+                    shows[values[key.key]].append((values['start_time'], delta))
+            for id, starts in shows.items():
+                starts.sort(key=lambda start: start[0])
+                deltas = [delta for _, delta in starts]
+                total = sum(deltas)
+                upcoming = case(*[(owner.counts_as_of <= start, sum(deltas[i:]))
+                                  for i, (start, _) in enumerate(starts)], else_=0)
+                connection.execute(
+                    update(owner).where(owner.id == id).values(
+                        upcoming_shows_count=owner.upcoming_shows_count + upcoming,
+                        past_shows_count=owner.past_shows_count + total - upcoming,
+                        updated_at=datetime.now()))
+
+    def counted(self, target, values, delta):
+        object_session(target).info.setdefault('show_counts', []).append((values, delta))
+
+    def showInserted(self, mapper, connection, target):
+        self.counted(target, {c: getattr(target, c) for c in self.columns}, 1)
+
+    def showDeleted(self, mapper, connection, target):
+        self.counted(target, {c: getattr(target, c) for c in self.columns}, -1)
+
+    def showUpdated(self, mapper, connection, target):
+        state = inspect(target)
+        old = {}
+        for c in self.columns:
+            history = state.attrs[c].history
+            old[c] = history.deleted[0] if history.deleted else getattr(target, c)
+        new = {c: getattr(target, c) for c in self.columns}
+        if old != new:
+            self.counted(target, old, -1)
+            self.counted(target, new, 1)
+
+    def ownerDeleted(self, deleted, deletedKey):
+        # the database cascades the owner's shows away; take them off the
+        # counters of the other owners first
+        def handler(mapper, connection, target):
+            for owner, key in self.owners:
+                if owner is deleted:
+                    continue
+                shows = select(func.count(self.show.id)).where(
+                    key == owner.id, deletedKey == target.id, self.show.start_time != None)
+                upcoming = shows.where(self.show.start_time >= owner.counts_as_of).scalar_subquery()
+                past = shows.where(self.show.start_time < owner.counts_as_of).scalar_subquery()
+                connection.execute(
+                    update(owner).where(owner.id.in_(select(key).where(deletedKey == target.id))).values(
+                        upcoming_shows_count=owner.upcoming_shows_count - upcoming,
+                        past_shows_count=owner.past_shows_count - past,
+                        updated_at=datetime.now()))
+        return handler
+
+    def counts(self, owner, key, now):
+        shows = select(func.count(self.show.id)).where(key == owner.id)
+        return (shows.where(self.show.start_time >= now).scalar_subquery(),
+                shows.where(self.show.start_time < now).scalar_subquery())
+
+    def recount(self, connection, now, owner, key, where):
+        upcoming, past = self.counts(owner, key, now)
+        return connection.execute(
+            update(owner).where(where).values(
+                upcoming_shows_count=upcoming, past_shows_count=past, counts_as_of=now,
+                updated_at=now)).rowcount
+
+    def rollover(self, connection, now=None):
+        """Bring the owners whose shows started since their counts_as_of up to
+        `now`; returns the number of rows updated per owner table."""
+        now = now or datetime.now()
+        updated = {}
+        for owner, key in self.owners:
+            started = exists().where(
+                key == owner.id,
+                self.show.start_time >= owner.counts_as_of,
+                self.show.start_time < now)
+            updated[owner.__tablename__] = self.recount(connection, now, owner, key, started)
+        return updated
+
+    def rebuild(self, connection, now=None):
+        now = now or datetime.now()
+        return {owner.__tablename__: self.recount(connection, now, owner, key, true())
+                for owner, key in self.owners}
+
+    def mismatches(self, connection, now=None):
+        """Rows whose stored counters differ from a recount at `now`, as
+        (table, id, stored upcoming, stored past, upcoming, past)."""
+        now = now or datetime.now()
+        found = []
+        for owner, key in self.owners:
+            upcoming, past = self.counts(owner, key, now)
+            query = select(owner.id, owner.upcoming_shows_count, owner.past_shows_count,
+                           upcoming.label('upcoming'), past.label('past')) \
+                .where((owner.upcoming_shows_count != upcoming) | (owner.past_shows_count != past))
+            found.extend((owner.__tablename__,) + tuple(row) for row in connection.execute(query))
+        return found
@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, AnyOf, Optional, URL, ValidationError
 from fyyurEnum import stateChoices, genresChoices
 
 class ShowForm(Form):
@@ -16,6 +16,15 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    # blank for SHOW_DEFAULT_MINUTES after start_time
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()]
+    )
+
+    def validate_end_time(self, field):
+        if field.data and self.start_time.data and field.data <= self.start_time.data:
+            raise ValidationError('The show must end after it starts.')
 
 class VenueForm(Form):
     name = StringField(
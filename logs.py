@@ -0,0 +1,146 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+# Logging off the request thread. Request threads only put records on a
+# bounded queue; one listener thread formats them and writes them to the
+# log file in batches, flushing once per batch. When the queue is full,
+# LOG_QUEUE_FULL decides: 'drop' the record (counted, and reported in the
+# log once there is room) or 'block' the request thread for up to
+# LOG_BLOCK_TIMEOUT seconds before dropping it.
+
+
+class BatchedFlush:
+    """Stream handler mixin that leaves flushing to the listener."""
+
+    def flush(self):
+        pass
+
+    def flushBatch(self):
+        super().flush()
+
+
+class BatchedRotatingFileHandler(BatchedFlush, RotatingFileHandler):
+    pass
+
+
+class BatchedTimedRotatingFileHandler(BatchedFlush, TimedRotatingFileHandler):
+    pass
+
+
+def fileHandler(config):
+    """The log file handler: rotated at LOG_MAX_BYTES, or on LOG_ROTATE_WHEN
+    (e.g. 'midnight') when that is set."""
+    filename = config.get('LOG_FILE', 'error.log')
+    backups = config.get('LOG_BACKUP_COUNT', 5)
+    if config.get('LOG_ROTATE_WHEN'):
+        return BatchedTimedRotatingFileHandler(filename, when=config['LOG_ROTATE_WHEN'], backupCount=backups)
+    return BatchedRotatingFileHandler(filename, maxBytes=config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+                                      backupCount=backups)
+
+
+class BoundedQueueHandler(QueueHandler):
+
+    def __init__(self, maxsize=10000, policy='drop', blockTimeout=None):
+        if policy not in ('drop', 'block'):
+            raise ValueError('Unknown LOG_QUEUE_FULL %r' % policy)
+        super().__init__(queue.Queue(maxsize))
+        self.policy = policy
+        self.blockTimeout = blockTimeout
+        self.dropped = 0
+        self.dropLock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            if self.policy == 'block':
+                self.queue.put(record, timeout=self.blockTimeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self.dropLock:
+                self.dropped += 1
+
+
+class BatchingListener(QueueListener):
+    """Writes whatever arrived within `flushInterval` of the first record of
+    a batch, up to `batchSize` records, then flushes once."""
+
+    def __init__(self, queueHandler, *handlers, batchSize=256, flushInterval=0.5):
+        super().__init__(queueHandler.queue, *handlers, respect_handler_level=True)
+        self.queueHandler = queueHandler
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+        self.written = 0
+        self.batches = 0
+        self.reportedDrops = 0
+
+    def stop(self):
+        # also registered with atexit
+        if self._thread is not None:
+            super().stop()
+
+    def enqueue_sentinel(self):
+        # the queue may be full; stop() has to get through
+        self.queue.put(self._sentinel)
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            deadline = time.monotonic() + self.flushInterval
+            while batch[-1] is not self._sentinel and len(batch) < self.batchSize:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(q.get(timeout=remaining) if remaining > 0 else q.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is not self._sentinel:
+                    self.handle(record)
+                    self.written += 1
+            self.reportDrops()
+            for handler in self.handlers:
+                getattr(handler, 'flushBatch', handler.flush)()
+            self.batches += 1
+            for _ in batch:
+                q.task_done()
+            if batch[-1] is self._sentinel:
+                return
+
+    def reportDrops(self):
+        dropped = self.queueHandler.dropped
+        if dropped > self.reportedDrops:
+            self.handle(logging.makeLogRecord({
+                'name': 'logs', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': '%d log records dropped, the log queue was full', 'args': (dropped - self.reportedDrops,)
+            }))
+            self.reportedDrops = dropped
+
+    def stats(self):
+        return {
+            'policy': self.queueHandler.policy,
+            'queued': self.queue.qsize(),
+            'capacity': self.queue.maxsize,
+            'dropped': self.queueHandler.dropped,
+            'written': self.written,
+            'batches': self.batches
+        }
+
+
+def queueLogging(app, *handlers):
+    """Send app.logger through a bounded queue to `handlers`, written by a
+    listener thread that runs until the process exits."""
+    queueHandler = BoundedQueueHandler(app.config.get('LOG_QUEUE_SIZE', 10000),
+                                       app.config.get('LOG_QUEUE_FULL', 'drop'),
+                                       app.config.get('LOG_BLOCK_TIMEOUT'))
+    listener = BatchingListener(queueHandler, *handlers,
+                                batchSize=app.config.get('LOG_BATCH_SIZE', 256),
+                                flushInterval=app.config.get('LOG_FLUSH_INTERVAL', 0.5))
+    app.logger.addHandler(queueHandler)
+    app.extensions['logQueue'] = listener
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,47 @@
+"""show counters
+
+Revision ID: 3f6b9d02c8e1
+Revises: e5a8c41b9f07
+Create Date: 2026-10-18 14:22:18.065127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6b9d02c8e1'
+down_revision = 'e5a8c41b9f07'
+branch_labels = None
+depends_on = None
+
+OWNERS = [('Venue', 'venue_id'), ('Artist', 'artist_id')]
+
+
+def now(dialect):
+    # SQLite only adds a column with a non-constant default to an empty
+    # table; there the rows get the time of the upgrade from an UPDATE
+    return sa.text("'1970-01-01 00:00:00'") if dialect == 'sqlite' else sa.func.now()
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table, key in OWNERS:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('counts_as_of', sa.DateTime(), server_default=now(dialect), nullable=False))
+        if dialect == 'sqlite':
+            op.execute('UPDATE "%s" SET counts_as_of = CURRENT_TIMESTAMP' % table)
+        # same as `flask counters check --fix`
+        op.execute(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id AND "Show".start_time >= "{table}".counts_as_of), '
+            'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id AND "Show".start_time < "{table}".counts_as_of)'
+            .format(table=table, key=key))
+
+
+def downgrade():
+    for table, key in OWNERS:
+        op.drop_column(table, 'counts_as_of')
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
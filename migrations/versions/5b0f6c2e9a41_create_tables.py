@@ -0,0 +1,69 @@
+"""create tables
+
+Revision ID: 5b0f6c2e9a41
+Revises:
+Create Date: 2022-05-01 18:02:47.331905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b0f6c2e9a41'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# The tables the later revisions build on, as db.create_all() made them
+# before the schema moved to migrations/ (but for the unique name of Venue,
+# which the next revision adds). A database created that way already has
+# them: `flask db stamp 5b0f6c2e9a41` before its first upgrade.
+
+
+def upgrade():
+    op.create_table('Venue',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('genres', sa.String(), nullable=False),
+        sa.Column('address', sa.String(length=120), nullable=False),
+        sa.Column('city', sa.String(length=120), nullable=False),
+        sa.Column('state', sa.String(length=120), nullable=True),
+        sa.Column('phone', sa.String(length=120), nullable=True),
+        sa.Column('website', sa.String(length=120), nullable=True),
+        sa.Column('facebook_link', sa.String(length=120), nullable=True),
+        sa.Column('seeking_talent', sa.Boolean(), nullable=True),
+        sa.Column('seeking_description', sa.String(), nullable=True),
+        sa.Column('image_link', sa.String(length=500), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('Artist',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('genres', sa.String(length=120), nullable=False),
+        sa.Column('city', sa.String(length=120), nullable=False),
+        sa.Column('state', sa.String(length=120), nullable=True),
+        sa.Column('phone', sa.String(length=120), nullable=True),
+        sa.Column('website', sa.String(length=120), nullable=True),
+        sa.Column('facebook_link', sa.String(length=120), nullable=True),
+        sa.Column('seeking_venue', sa.Boolean(), nullable=True),
+        sa.Column('seeking_description', sa.String(), nullable=True),
+        sa.Column('image_link', sa.String(length=500), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.create_table('Show',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=True),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='cascade'),
+        sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='cascade'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('Show')
+    op.drop_table('Artist')
+    op.drop_table('Venue')
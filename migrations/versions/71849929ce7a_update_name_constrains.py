@@ -1,7 +1,7 @@
 """update name constrains
 
 Revision ID: 71849929ce7a
-Revises: 
+Revises: 5b0f6c2e9a41
 Create Date: 2022-05-02 14:30:21.619654
 
 """
@@ -11,18 +11,25 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = '71849929ce7a'
-down_revision = None
+down_revision = '5b0f6c2e9a41'
 branch_labels = None
 depends_on = None
 
 
+# the name Postgres gives an unnamed one; SQLite needs the batch mode to
+# change constraints at all
+NAME = 'Venue_name_key'
+
+
 def upgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.create_unique_constraint(None, 'Venue', ['name'])
-    # ### end Alembic commands ###
+    # a database from db.create_all() has it already
+    unique = sa.inspect(op.get_bind()).get_unique_constraints('Venue')
+    if any(constraint['column_names'] == ['name'] for constraint in unique):
+        return
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.create_unique_constraint(NAME, ['name'])
 
 
 def downgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_constraint(None, 'Venue', type_='unique')
-    # ### end Alembic commands ###
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.drop_constraint(NAME, type_='unique')
@@ -0,0 +1,44 @@
+"""search trigram indexes
+
+Revision ID: 9c1d2e7f4a3b
+Revises: 71849929ce7a
+Create Date: 2026-10-18 10:12:04.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c1d2e7f4a3b'
+down_revision = '71849929ce7a'
+branch_labels = None
+depends_on = None
+
+# lower(col) LIKE '%term%' and similarity(lower(col), term) in search_venues /
+# search_artists are served by these indexes instead of a sequential scan.
+# Other databases search through search.ModelIndex and get none of them.
+COLUMNS = {
+    'Venue': ('name', 'city', 'state'),
+    'Artist': ('name', 'city', 'state'),
+}
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, columns in COLUMNS.items():
+        for column in columns:
+            op.create_index(
+                'ix_%s_%s_trgm' % (table.lower(), column), table,
+                [sa.text('lower(%s) gin_trgm_ops' % column)],
+                postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, columns in COLUMNS.items():
+        for column in columns:
+            op.drop_index('ix_%s_%s_trgm' % (table.lower(), column), table_name=table)
@@ -0,0 +1,39 @@
+"""updated_at columns
+
+Revision ID: a8d3e61c5f24
+Revises: 3f6b9d02c8e1
+Create Date: 2026-10-18 17:05:41.302518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3e61c5f24'
+down_revision = '3f6b9d02c8e1'
+branch_labels = None
+depends_on = None
+
+TABLES = ['Venue', 'Artist', 'Show']
+
+
+def now(dialect):
+    # SQLite only adds a column with a non-constant default to an empty
+    # table; there the rows get the time of the upgrade from an UPDATE
+    return sa.text("'1970-01-01 00:00:00'") if dialect == 'sqlite' else sa.func.now()
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=now(dialect), nullable=False))
+        if dialect == 'sqlite':
+            op.execute('UPDATE "%s" SET updated_at = CURRENT_TIMESTAMP' % table)
+        op.create_index('ix_%s_updated_at' % table.lower(), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index('ix_%s_updated_at' % table.lower(), table_name=table)
+        op.drop_column(table, 'updated_at')
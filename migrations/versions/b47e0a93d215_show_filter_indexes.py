@@ -0,0 +1,30 @@
+"""show filter indexes
+
+Revision ID: b47e0a93d215
+Revises: 9c1d2e7f4a3b
+Create Date: 2026-10-18 11:40:37.502184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b47e0a93d215'
+down_revision = '9c1d2e7f4a3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'])
+    op.create_index('ix_venue_lower_name', 'Venue', [sa.text('lower(name)')])
+    op.create_index('ix_artist_lower_name', 'Artist', [sa.text('lower(name)')])
+
+
+def downgrade():
+    op.drop_index('ix_artist_lower_name', table_name='Artist')
+    op.drop_index('ix_venue_lower_name', table_name='Venue')
+    op.drop_index('ix_show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='Show')
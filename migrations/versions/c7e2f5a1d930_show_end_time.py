@@ -0,0 +1,59 @@
+"""show end_time and double-booking constraints
+
+Revision ID: c7e2f5a1d930
+Revises: a8d3e61c5f24
+Create Date: 2026-10-18 18:20:13.550914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2f5a1d930'
+down_revision = 'a8d3e61c5f24'
+branch_labels = None
+depends_on = None
+
+# Existing shows get the default length (SHOW_DEFAULT_MINUTES). A show that
+# then overlaps an earlier one of its venue or artist keeps a NULL end_time
+# and stays out of the constraints; the rest cannot overlap any more. The
+# exclusion constraints are Postgres only, like their tsrange.
+MINUTES = 120
+KEYS = ('venue_id', 'artist_id')
+
+
+def shifted(column, minutes, dialect):
+    if dialect == 'postgresql':
+        return "%s + interval '%d minutes'" % (column, minutes)
+    return "datetime(%s, '%+d minutes')" % (column, minutes)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute('UPDATE "Show" SET end_time = %s' % shifted('start_time', MINUTES, dialect))
+    op.execute('UPDATE "Show" SET end_time = NULL WHERE ' + ' OR '.join(
+        'EXISTS (SELECT 1 FROM "Show" AS o WHERE o.{0} = "Show".{0} AND o.id < "Show".id'
+        ' AND o.start_time > {1} AND o.start_time < "Show".end_time'
+        ' AND o.end_time > "Show".start_time)'.format(key, shifted('"Show".start_time', -MINUTES, dialect))
+        for key in KEYS))
+    # SQLite can only add the check by copying the table
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.create_check_constraint('ck_show_end_after_start', 'end_time > start_time')
+    if dialect != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for key in KEYS:
+        op.execute(
+            'ALTER TABLE "Show" ADD CONSTRAINT ex_show_%s_overlap EXCLUDE USING gist '
+            '(%s WITH =, tsrange(start_time, end_time) WITH &&) WHERE (end_time IS NOT NULL)' % (key, key))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for key in KEYS:
+            op.drop_constraint('ex_show_%s_overlap' % key, 'Show')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_constraint('ck_show_end_after_start', type_='check')
+        batch_op.drop_column('end_time')
@@ -0,0 +1,28 @@
+"""show (start_time, id) index
+
+Revision ID: d4b81f0e6c27
+Revises: c7e2f5a1d930
+Create Date: 2026-10-18 19:02:55.814306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b81f0e6c27'
+down_revision = 'c7e2f5a1d930'
+branch_labels = None
+depends_on = None
+
+# /shows and the exports page through every show in (start_time, id) order,
+# continuing after a (start_time, id) cursor: read in index order, a page
+# stops after its rows instead of sorting the table.
+
+
+def upgrade():
+    op.create_index('ix_show_start_time_id', 'Show', ['start_time', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_id', table_name='Show')
@@ -0,0 +1,96 @@
+"""normalize genres
+
+Revision ID: e5a8c41b9f07
+Revises: b47e0a93d215
+Create Date: 2026-10-18 13:05:51.733940
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a8c41b9f07'
+down_revision = 'b47e0a93d215'
+branch_labels = None
+depends_on = None
+
+# fyyurEnum.genresChoices at the time of this revision
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+]
+
+# (owner table, association table, owner key)
+OWNERS = [
+    ('Venue', 'VenueGenre', 'venue_id'),
+    ('Artist', 'ArtistGenre', 'artist_id'),
+]
+
+genre = sa.table('Genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+
+def upgrade():
+    op.create_table('Genre',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    for table, association, key in OWNERS:
+        op.create_table(association,
+            sa.Column(key, sa.Integer(), nullable=False),
+            sa.Column('genre_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint([key], [table + '.id'], ondelete='cascade'),
+            sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='cascade'),
+            sa.PrimaryKeyConstraint(key, 'genre_id')
+        )
+        op.create_index('ix_%s_genre_id' % association.lower(), association, ['genre_id'])
+
+    conn = op.get_bind()
+    decoded = {}
+    for table, association, key in OWNERS:
+        owner = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        decoded[table] = [(id, list(dict.fromkeys(json.loads(genres or '[]'))))
+                          for id, genres in conn.execute(sa.select(owner.c.id, owner.c.genres))]
+
+    # seed the form choices plus anything stored that is no longer one of them
+    names = list(GENRES)
+    for rows in decoded.values():
+        for _, genres in rows:
+            names.extend(name for name in genres if name not in names)
+    op.bulk_insert(genre, [{'name': name} for name in names])
+    ids = dict(conn.execute(sa.select(genre.c.name, genre.c.id)).fetchall())
+
+    for table, association, key in OWNERS:
+        link = sa.table(association, sa.column(key, sa.Integer), sa.column('genre_id', sa.Integer))
+        rows = [{key: id, 'genre_id': ids[name]} for id, genres in decoded[table] for name in genres]
+        if rows:
+            op.bulk_insert(link, rows)
+        op.drop_column(table, 'genres')
+
+
+def downgrade():
+    conn = op.get_bind()
+    for table, association, key in OWNERS:
+        op.add_column(table, sa.Column('genres', sa.String(), nullable=True))
+        owner = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        link = sa.table(association, sa.column(key, sa.Integer), sa.column('genre_id', sa.Integer))
+        names = {}
+        query = sa.select(link.c[key], genre.c.name).select_from(link.join(genre, link.c.genre_id == genre.c.id)) \
+            .order_by(link.c[key], genre.c.name)
+        for id, name in conn.execute(query):
+            names.setdefault(id, []).append(name)
+        for (id,) in conn.execute(sa.select(owner.c.id)).fetchall():
+            conn.execute(owner.update().where(owner.c.id == id).values(genres=json.dumps(names.get(id, []))))
+        # SQLite cannot change it in place, and copying the table would lose
+        # its lower(name) index
+        if conn.dialect.name != 'sqlite':
+            op.alter_column(table, 'genres', nullable=False)
+        op.drop_index('ix_%s_genre_id' % association.lower(), table_name=association)
+        op.drop_table(association)
+    op.drop_table('Genre')
@@ -0,0 +1,43 @@
+"""sqlite now() defaults
+
+Revision ID: f2a9c4d7e318
+Revises: d4b81f0e6c27
+Create Date: 2026-10-18 20:14:37.520861
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a9c4d7e318'
+down_revision = 'd4b81f0e6c27'
+branch_labels = None
+depends_on = None
+
+# 3f6b9d02c8e1 and a8d3e61c5f24 could only add counts_as_of and updated_at
+# to SQLite tables with a constant default; give them the models' now()
+# default. SQLite changes a default by copying the table, which drops the
+# expression indexes, so those are made again. Postgres has it already.
+COLUMNS = {'Venue': ['counts_as_of', 'updated_at'], 'Artist': ['counts_as_of', 'updated_at'], 'Show': ['updated_at']}
+NAME_INDEXES = {'Venue': 'ix_venue_lower_name', 'Artist': 'ix_artist_lower_name'}
+
+
+def setDefaults(default):
+    for table, columns in COLUMNS.items():
+        with op.batch_alter_table(table, recreate='always') as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, server_default=default, existing_type=sa.DateTime(),
+                                      existing_nullable=False)
+        if table in NAME_INDEXES:
+            op.create_index(NAME_INDEXES[table], table, [sa.text('lower(name)')], unique=False)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        setDefaults(sa.func.now())
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        setDefaults(sa.text("'1970-01-01 00:00:00'"))
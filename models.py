@@ -0,0 +1,170 @@
+from datetime import datetime
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from routing import RoutingSQLAlchemy
+
+# The schema is managed by the revisions under migrations/ (`flask db upgrade`);
+# nothing here touches the database at import time. Reads of @readOnly views go
+# to the replicas, see routing.py.
+db = RoutingSQLAlchemy()
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique = True, nullable=False)
+
+# the composite primary keys serve venue/artist -> genres, the genre_id indexes
+# serve the ?genre= filters on the listings
+VenueGenre = db.Table('VenueGenre',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete="cascade"), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete="cascade"), primary_key=True),
+    db.Index('ix_venuegenre_genre_id', 'genre_id'))
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, unique = True, nullable=False)
+    genres = db.relationship('Genre', secondary=VenueGenre, order_by='Genre.name')
+    address = db.Column(db.String(120), nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    facebook_link = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String)
+    image_link = db.Column(db.String(500))
+    # maintained by showCounters, see counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    counts_as_of = db.Column(db.DateTime, nullable=False, default=datetime.now, server_default=func.now())
+    # set by the create/edit routes and the counters; feeds the page validators
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now,
+                           server_default=func.now())
+
+    __table_args__ = (
+        db.Index('ix_venue_lower_name', func.lower(name)),
+        db.Index('ix_venue_updated_at', updated_at),
+    )
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+ArtistGenre = db.Table('ArtistGenre',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete="cascade"), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete="cascade"), primary_key=True),
+    db.Index('ix_artistgenre_genre_id', 'genre_id'))
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, unique = True, nullable=False)
+    genres = db.relationship('Genre', secondary=ArtistGenre, order_by='Genre.name')
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    facebook_link = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String)
+    image_link = db.Column(db.String(500))
+    # maintained by showCounters, see counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    counts_as_of = db.Column(db.DateTime, nullable=False, default=datetime.now, server_default=func.now())
+    # set by the create/edit routes and the counters; feeds the page validators
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now,
+                           server_default=func.now())
+
+    __table_args__ = (
+        db.Index('ix_artist_lower_name', func.lower(name)),
+        db.Index('ix_artist_updated_at', updated_at),
+    )
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+
+class Show(db.Model):
+    __tablename__ = 'Show'
+
+    id = db.Column(db.Integer, primary_key=True)
+    start_time = db.Column(db.DateTime)
+    # NULL only for shows that already overlapped when end times came in,
+    # which the double-booking checks leave out (see bookings.py)
+    end_time = db.Column(db.DateTime)
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete="cascade"),
+                         nullable=False)
+    venue = db.relationship('Venue', cascade = "all,delete", backref=db.backref('venue', lazy=True, passive_deletes=True))
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete="cascade"),
+                          nullable=False)
+    artist = db.relationship('Artist', cascade = "all,delete", backref=db.backref('artist', lazy=True, passive_deletes=True))
+
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now,
+                           server_default=func.now())
+
+    # every listing filters a venue's or an artist's shows by start_time, and
+    # /shows pages through all of them in (start_time, id) order; on Postgres
+    # the migrations add exclusion constraints on the time ranges of each
+    # venue's and each artist's shows
+    __table_args__ = (
+        db.CheckConstraint('end_time > start_time', name='ck_show_end_after_start'),
+        db.Index('ix_show_start_time_id', start_time, id),
+        db.Index('ix_show_venue_id_start_time', venue_id, start_time),
+        db.Index('ix_show_artist_id_start_time', artist_id, start_time),
+        db.Index('ix_show_updated_at', updated_at),
+    )
+
+def insertGenres(connection, names):
+    # Genre rows for `names`, skipping the ones another transaction has
+    # listed meanwhile instead of failing on the unique name
+    rows = [{'name': name} for name in names]
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = (postgresql if dialect == 'postgresql' else sqlite).insert
+        connection.execute(insert(Genre.__table__).on_conflict_do_nothing(index_elements=['name']), rows)
+        return
+    for row in rows:
+        try:
+            with connection.begin_nested():
+                connection.execute(Genre.__table__.insert(), row)
+        except IntegrityError:
+            pass
+
+def genresByName(names):
+    # Genre rows for the submitted names, creating any that are missing
+    names = list(dict.fromkeys(names))
+    genres = {genre.name: genre for genre in Genre.query.filter(Genre.name.in_(names))}
+    missing = [name for name in names if name not in genres]
+    if missing:
+        insertGenres(db.session.connection(), missing)
+        genres.update((genre.name, genre) for genre in Genre.query.filter(Genre.name.in_(missing)))
+    return [genres[name] for name in names]
+
+def showListing(upcoming=False, after=None, since=None, until=None):
+    # columns of the show listings in (start_time, id) order; `after` is a
+    # decoded cursor to continue from, `since`/`until` bound start_time
+    # (inclusive/exclusive)
+    result = db.session.query(Show.id, Show.start_time, Show.end_time, Show.artist_id, Show.venue_id,
+                              Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link'),
+                              Venue.name.label('venue_name')) \
+        .join(Artist, Show.artist_id == Artist.id).join(Venue, Show.venue_id == Venue.id) \
+        .filter(Show.start_time != None)
+    if upcoming:
+        result = result.filter(Show.start_time >= datetime.now())
+    if after is not None:
+        result = result.filter(tuple_(Show.start_time, Show.id) > after)
+    if since is not None:
+        result = result.filter(Show.start_time >= since)
+    if until is not None:
+        result = result.filter(Show.start_time < until)
+    return result.order_by(Show.start_time, Show.id)
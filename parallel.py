@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import copy_current_request_context, current_app, g, has_request_context
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
+
+from models import db
+
+# Independent queries of one page, run at the same time so that the page
+# waits for the slowest of them rather than their sum. The first query runs
+# on the request thread with db.session as usual. Each of the others runs on
+# a pool thread under a copy of the request context, which gives it a
+# db.session and a connection of its own, sent to the replica or the primary
+# like the request's (see routing.py) and counted by timing.py. Its session
+# is closed when it returns, so it should return rows or plain data rather
+# than objects that load more on access.
+#
+# READ_CONCURRENCY=0 runs them one after another on the request thread.
+
+
+def oneConnection(engine):
+    # an in-memory SQLite database lives in a single connection: Flask-SQLAlchemy
+    # shares it between threads through a StaticPool (plain SQLAlchemy keeps one
+    # per thread in a SingletonThreadPool), and it cannot run two queries at once
+    if engine.dialect.name == 'sqlite' and engine.url.database in (None, '', ':memory:'):
+        return True
+    return isinstance(engine.pool, (StaticPool, SingletonThreadPool))
+
+
+class ParallelReads:
+
+    def init_app(self, app):
+        workers = app.config.get('READ_CONCURRENCY', 0)
+        app.extensions['parallelReads'] = ThreadPoolExecutor(workers, 'reads') if workers else None
+
+    def gather(self, first, *rest):
+        """The results of the callables, in order."""
+        executor = current_app.extensions.get('parallelReads')
+        if executor is None or not rest or not has_request_context() or oneConnection(db.engine):
+            return [first()] + [query() for query in rest]
+        futures = [executor.submit(self.inRequest(query)) for query in rest]
+        try:
+            result = first()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        return [result] + [future.result() for future in futures]
+
+    def inRequest(self, query):
+        readOnly = g.get('db_read_only')
+        timing = g.get('timing')
+
+        @copy_current_request_context
+        def run():
+            g.db_read_only = readOnly
+            if timing is not None:
+                g.timing = timing
+            return query()
+        return run
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+# Engine and pool settings from the DB_* config keys (see config.py). Each
+# worker process builds its own engine on its first query, so every number
+# here is per worker.
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.waits = 0
+        self.waitTime = 0.0
+        self.maxWait = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self.lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self.lock:
+                self.waits += 1
+                self.waitTime += waited
+                self.maxWait = max(self.maxWait, waited)
+
+
+def engineOptions(config):
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        return {}
+    if config.get('DB_NULLPOOL'):
+        # behind pgbouncer: it does the pooling, every checkout is a new connection
+        options = {'poolclass': NullPool}
+    else:
+        options = {
+            'poolclass': TimedQueuePool,
+            'pool_size': config.get('DB_POOL_SIZE', 5),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+            'pool_recycle': config.get('DB_POOL_RECYCLE', -1),
+            'pool_pre_ping': config.get('DB_POOL_PRE_PING', False),
+        }
+    if url.get_backend_name() == 'postgresql' and config.get('DB_STATEMENT_TIMEOUT'):
+        options['connect_args'] = {'options': '-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT']}
+    return options
+
+
+@event.listens_for(Engine, 'connect')
+def sqliteForeignKeys(connection, record):
+    # SQLite leaves foreign keys, and with them ON DELETE CASCADE, off on
+    # every new connection
+    if isinstance(connection, sqlite3.Connection):
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+def poolStats(pool):
+    stats = {'pid': os.getpid(), 'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+        })
+    if isinstance(pool, TimedQueuePool):
+        stats.update({
+            'checkouts': pool.waits,
+            'timeouts': pool.timeouts,
+            'wait_ms_total': round(pool.waitTime * 1000, 3),
+            'wait_ms_avg': round(pool.waitTime * 1000 / pool.waits, 3) if pool.waits else 0.0,
+            'wait_ms_max': round(pool.maxWait * 1000, 3),
+        })
+    return stats
@@ -0,0 +1,122 @@
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, orm, text
+
+from pool import engineOptions
+
+# Read-replica routing. Views wrapped in @readOnly send their queries to one of
+# SQLALCHEMY_REPLICA_URIS, round-robin over the replicas that passed their last
+# health check. Everything else stays on the primary, and so does the rest of
+# a request once its session has flushed a write. After a request that
+# committed, the client's next REPLICA_STICKY_SECONDS of reads also go to the
+# primary, so a redirect after a form post sees its own write.
+
+
+class ReplicaSet:
+
+    def __init__(self, engines, checkInterval=10, retryAfter=30):
+        self.engines = engines
+        self.checkInterval = checkInterval
+        self.retryAfter = retryAfter
+        self.checkedAt = {engine: 0.0 for engine in engines}
+        self.downUntil = {engine: 0.0 for engine in engines}
+        self.order = itertools.cycle(engines)
+        self.lock = threading.Lock()
+
+    def healthy(self, engine, now):
+        if self.downUntil[engine] > now:
+            return False
+        if now - self.checkedAt[engine] < self.checkInterval:
+            return True
+        try:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+        except Exception:
+            current_app.logger.warning('Replica %s failed its health check', engine.url)
+            self.downUntil[engine] = now + self.retryAfter
+            return False
+        self.checkedAt[engine] = now
+        return True
+
+    def choose(self):
+        """The next healthy replica, or None to fall back to the primary."""
+        now = time.time()
+        for _ in range(len(self.engines)):
+            with self.lock:
+                engine = next(self.order)
+            if self.healthy(engine, now):
+                return engine
+        return None
+
+    def markDown(self, engine):
+        self.downUntil[engine] = time.time() + self.retryAfter
+
+    def stats(self):
+        now = time.time()
+        return [{'replica': i, 'up': self.downUntil[engine] <= now} for i, engine in enumerate(self.engines)]
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not self._flushing and not self.info.get('wrote'):
+            replica = self.info.get('replica')
+            if replica is None and g and g.get('db_read_only'):
+                replica = self.info['replica'] = current_app.extensions['replicas'].choose() or False
+            if replica:
+                return replica
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def afterFlush(dbSession, context):
+    dbSession.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def afterCommit(dbSession):
+    if dbSession.info.get('wrote') and g:
+        g.db_wrote = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        super().init_app(app)
+        engines = []
+        for uri in app.config.get('SQLALCHEMY_REPLICA_URIS') or []:
+            options = engineOptions(dict(app.config, SQLALCHEMY_DATABASE_URI=uri))
+            engine = create_engine(uri, **options)
+            engines.append(engine)
+        replicas = ReplicaSet(engines, app.config.get('REPLICA_CHECK_INTERVAL', 10),
+                              app.config.get('REPLICA_RETRY_AFTER', 30))
+        for engine in engines:
+            @event.listens_for(engine, 'handle_error')
+            def replicaFailed(context, engine=engine):
+                if context.is_disconnect or context.connection is None:
+                    replicas.markDown(engine)
+        app.extensions['replicas'] = replicas
+
+        @app.after_request
+        def stickToPrimary(response):
+            if g.get('db_wrote'):
+                session['db_primary_until'] = time.time() + app.config.get('REPLICA_STICKY_SECONDS', 5)
+            return response
+
+
+def readOnly(view):
+    """Route the view's queries to a replica unless the client wrote recently."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = session.get('db_primary_until', 0) < time.time()
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,220 @@
+import re
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import object_session
+
+# Trigram search fallback for databases without pg_trgm (SQLite in
+# development and tests). Postgres serves search from the GIN indexes added
+# in migrations/versions/9c1d2e7f4a3b_search_trigram_indexes.py.
+
+WORD = re.compile(r'\w+')
+
+
+def trigrams(text):
+    # every trigram of the padded, lowercased words; a substring of `text`
+    # shares all of its inner trigrams with it
+    grams = set()
+    for word in WORD.findall(text.lower()):
+        padded = '  ' + word + ' '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def innerTrigrams(term):
+    term = term.lower()
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def similarity(a, b):
+    # same measure as pg_trgm's similarity(): shared / distinct trigrams
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class NgramIndex:
+
+    def __init__(self):
+        self.docs = {}
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, key, *fields):
+        self.remove(key)
+        fields = tuple((f or '').lower() for f in fields)
+        grams = [trigrams(f) for f in fields]
+        self.docs[key] = (fields, grams)
+        for gram in set().union(*grams):
+            self.postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key):
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        for gram in set().union(*doc[1]):
+            keys = self.postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self.postings[gram]
+
+    def candidates(self, term):
+        grams = innerTrigrams(term)
+        # terms shorter than a trigram, or spanning word boundaries, cannot
+        # be narrowed through the postings lists
+        grams = {g for g in grams if WORD.fullmatch(g)}
+        if not grams:
+            return self.docs.keys()
+        keys = None
+        for gram in sorted(grams, key=lambda g: len(self.postings.get(g, ()))):
+            found = self.postings.get(gram)
+            if not found:
+                return set()
+            keys = set(found) if keys is None else keys & found
+            if not keys:
+                break
+        return keys
+
+    def search(self, term):
+        """Return the keys whose fields contain `term`, best match first.
+
+        Ties on similarity are broken by the first field (the name).
+        """
+        term = term.lower()
+        grams = trigrams(term)
+        scored = []
+        for key in self.candidates(term):
+            fields, fieldGrams = self.docs[key]
+            if not any(term in f for f in fields):
+                continue
+            score = max(similarity(grams, g) for g in fieldGrams)
+            scored.append((-score, fields[0], key))
+        scored.sort()
+        return [key for _, _, key in scored]
+
+
+class ModelIndex:
+    """NgramIndex over `columns` of a model, built on first use.
+
+    This process's commits are applied to it as they happen. Other
+    processes' writes are read back through updated_at every
+    SEARCH_INDEX_REFRESH seconds, and a row count that no longer matches (a
+    delete elsewhere) rebuilds it while the old one keeps answering."""
+
+    def __init__(self, model, *columns):
+        self.model = model
+        self.columns = columns
+        self.index = None
+        # `lock` covers searches and changes, `updating` the reads of the table
+        self.lock = threading.Lock()
+        self.updating = threading.Lock()
+        # the newest updated_at read, and when the table was last checked
+        self.seenUpTo = None
+        self.checkedAt = 0.0
+
+    def invalidate(self):
+        self.index = None
+
+    def build(self, session):
+        model = self.model
+        index = NgramIndex()
+        seenUpTo = None
+        for row in session.execute(select(model.id, model.updated_at, *self.columns)):
+            index.add(row[0], *row[2:])
+            seenUpTo = max(seenUpTo or row[1], row[1])
+        with self.lock:
+            self.index, self.seenUpTo = index, seenUpTo
+            self.checkedAt = time.monotonic()
+
+    def refresh(self, session):
+        model = self.model
+        query = select(model.id, model.updated_at, *self.columns)
+        if self.seenUpTo is not None:
+            query = query.where(model.updated_at >= self.seenUpTo)
+        changed = session.execute(query).all()
+        count = session.execute(select(func.count()).select_from(model)).scalar()
+        with self.lock:
+            self.checkedAt = time.monotonic()
+            for row in changed:
+                self.index.add(row[0], *row[2:])
+                self.seenUpTo = max(self.seenUpTo or row[1], row[1])
+            if count == len(self.index):
+                return
+        self.build(session)
+
+    def current(self, session, refreshAfter):
+        if self.index is None:
+            with self.updating:
+                if self.index is None:
+                    self.build(session)
+        elif time.monotonic() - self.checkedAt >= refreshAfter and self.updating.acquire(blocking=False):
+            try:
+                self.refresh(session)
+            finally:
+                self.updating.release()
+        return self.index
+
+    def apply(self, id, fields):
+        with self.lock:
+            if self.index is None:
+                return
+            if fields is None:
+                self.index.remove(id)
+            else:
+                self.index.add(id, *fields)
+
+    def search(self, session, term):
+        index = self.current(session, current_app.config.get('SEARCH_INDEX_REFRESH', 60))
+        with self.lock:
+            return index.search(term)
+
+
+class Search:
+    """The ModelIndex of each kind, per app in app.extensions['search']."""
+
+    def __init__(self, **kinds):
+        # kind -> (model, indexed columns)
+        self.kinds = kinds
+        for kind, (model, *columns) in kinds.items():
+            event.listen(model, 'after_insert', self.touched(kind, columns))
+            event.listen(model, 'after_update', self.touched(kind, columns))
+            event.listen(model, 'after_delete', self.touched(kind, columns, deleted=True))
+
+    def init_app(self, app):
+        app.extensions['search'] = {kind: ModelIndex(model, *columns)
+                                    for kind, (model, *columns) in self.kinds.items()}
+
+    def touched(self, kind, columns, deleted=False):
+        def listener(mapper, connection, target):
+            attrs = inspect(target).attrs
+            if not deleted and not any(attrs[column.key].history.has_changes() for column in columns):
+                return
+            fields = None if deleted else [getattr(target, column.key) for column in columns]
+            object_session(target).info.setdefault('search_touched', []).append((kind, target.id, fields))
+        return listener
+
+    def watchCommits(self, session):
+        # the app's indexes take the changes of a transaction once it is committed
+        @event.listens_for(session, 'after_commit')
+        def afterCommit(session):
+            touched = session.info.pop('search_touched', ())
+            if touched:
+                indexes = current_app.extensions['search']
+                for kind, id, fields in touched:
+                    indexes[kind].apply(id, fields)
+
+        @event.listens_for(session, 'after_rollback')
+        def afterRollback(session):
+            session.info.pop('search_touched', None)
+
+    def index(self, kind):
+        return current_app.extensions['search'][kind]
+
+    def invalidate(self):
+        for index in current_app.extensions['search'].values():
+            index.invalidate()
@@ -0,0 +1,63 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from bench import benchConfig
+from bench.seed import seed
+from models import db
+
+# The app of create_app() over SQLite files seeded by bench.seed, through the
+# migrations, and a record of the SQL statements run while serving requests.
+
+
+@pytest.fixture(scope='session')
+def seeded(tmp_path_factory):
+    # seeded(venues, artists, shows, **config) -> an app over a database of
+    # that size, seeded once per session
+    apps = {}
+
+    def make(venues=20, artists=30, shows=300, **config):
+        key = (venues, artists, shows, tuple(sorted(config.items())))
+        if key not in apps:
+            path = tmp_path_factory.mktemp('db')
+            settings = dict(DEBUG=False, CACHE_TYPE='null', SQLALCHEMY_REPLICA_URIS=[],
+                            LOG_FILE=str(path / 'error.log'))
+            settings.update(config)
+            application = create_app(benchConfig('sqlite:///%s' % (path / 'fyyur.sqlite'), **settings))
+            seed(application, venues, artists, shows)
+            apps[key] = application
+        return apps[key]
+    return make
+
+
+@pytest.fixture
+def app(seeded):
+    return seeded()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def statements():
+    # `with statements(app) as executed:` lists the SQL run inside the block,
+    # as (statement, parameters)
+    @contextmanager
+    def record(application):
+        executed = []
+
+        def listener(connection, cursor, statement, parameters, context, executemany):
+            executed.append((statement, parameters))
+
+        with application.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            yield executed
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+    return record
@@ -0,0 +1,23 @@
+def test_apps_keep_their_own_page_cache(seeded):
+    cached = seeded(CACHE_TYPE='lru')
+    uncached = seeded(CACHE_TYPE='null')
+    for application in (cached, uncached):
+        client = application.test_client()
+        client.get('/venues')
+        client.get('/venues')
+    assert cached.extensions['pageCache'].hits == 1
+    assert type(uncached.extensions['pageCache'].backend).__name__ == 'NullCache'
+    assert uncached.extensions['pageCache'].hits == 0
+
+
+def test_apps_keep_their_own_search_and_autocomplete_indexes(seeded):
+    small = seeded(venues=20, artists=30)
+    large = seeded(venues=400, artists=600)
+    counts = []
+    for application in (small, large):
+        client = application.test_client()
+        page = client.post('/venues/search', data={'search_term': 'Venue'}).get_data(as_text=True)
+        counts.append(int(page.split('</h3>')[0].rsplit(':', 1)[1]))
+        names = client.get('/autocomplete?q=V&kind=venues&limit=50').get_json()['venues']
+        assert len(names) == min(50, 20 if application is small else 400)
+    assert counts == [20, 400]
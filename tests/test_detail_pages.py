@@ -0,0 +1,47 @@
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func
+
+from models import Artist, Show, Venue, db
+
+pages = [('/venues/%d', Venue, Show.venue_id), ('/artists/%d', Artist, Show.artist_id)]
+
+
+def busiest(application, key):
+    # the owner with the most shows, and their number
+    with application.app_context():
+        return db.session.query(key, func.count(Show.id)).group_by(key) \
+            .order_by(func.count(Show.id).desc()).first()
+
+
+@pytest.mark.parametrize('url, model, key', pages)
+def test_detail_page_runs_the_same_statements_for_any_number_of_shows(seeded, statements, url, model, key):
+    counts = []
+    for shows in (100, 3000):
+        application = seeded(shows=shows)
+        id, _ = busiest(application, key)
+        client = application.test_client()
+        with statements(application) as executed:
+            response = client.get(url % id)
+        assert response.status_code == 200
+        counts.append(len(executed))
+    # the page validator, then the owner and its shows side by side
+    assert counts == [3, 3]
+
+
+@pytest.mark.parametrize('url, model, key', pages)
+def test_detail_page_splits_past_and_upcoming_shows(app, url, model, key):
+    id, total = busiest(app, key)
+    now = datetime.now()
+    with app.app_context():
+        upcoming = Show.query.filter(key == id, Show.start_time >= now).count()
+    page = app.test_client().get(url % id).get_data(as_text=True)
+    assert re.search(r'>\s*%d Upcoming Shows?<' % upcoming, page)
+    assert re.search(r'>\s*%d Past Shows?<' % (total - upcoming), page)
+
+
+@pytest.mark.parametrize('url, model, key', pages)
+def test_detail_page_of_a_missing_owner_is_a_404(app, url, model, key):
+    assert app.test_client().get(url % 100000).status_code == 404
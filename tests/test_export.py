@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+from models import Show
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHOWS = 1000000
+# peak RSS of a process exporting all of them, the app included; kept
+# in memory, the rows alone would take several times this
+RSS_CEILING_KB = 160 * 1024
+
+# streams an export in a process of its own, so that its peak RSS is the
+# export's and not that of the seeding; VmHWM starts over at exec, where
+# ru_maxrss keeps the high-water mark of the forking process
+EXPORT = '''
+import json, sys
+from app import create_app
+from bench import benchConfig
+application = create_app(benchConfig(sys.argv[1], CACHE_TYPE='null'))
+response = application.test_client().get(sys.argv[2], buffered=False)
+lines = 0
+for chunk in response.response:
+    lines += chunk.count(b'\\n')
+response.close()
+peak = [line.split()[1] for line in open('/proc/self/status') if line.startswith('VmHWM:')][0]
+print(json.dumps({'status': response.status_code, 'lines': lines, 'rss_kb': int(peak)}))
+'''
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='reads the peak RSS from /proc')
+@pytest.mark.parametrize('url, header', [('/shows/export.csv', 1), ('/shows/export.ndjson', 0)])
+def test_export_streams_a_million_shows_in_flat_memory(seeded, url, header):
+    application = seeded(venues=1000, artists=2000, shows=SHOWS)
+    result = subprocess.run([sys.executable, '-c', EXPORT, application.config['SQLALCHEMY_DATABASE_URI'], url],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.splitlines()[-1])
+    assert report['status'] == 200
+    assert report['lines'] == SHOWS + header
+    assert report['rss_kb'] < RSS_CEILING_KB
+
+
+def test_export_bounds_start_time_by_from_and_to(app, client):
+    # the seeded shows span a year either side of today
+    since, until = (date.today() + timedelta(days=days) for days in (-60, 60))
+    query = 'from=%s&to=%s' % (since, until)
+    with app.app_context():
+        expected = Show.query.filter(Show.start_time >= since, Show.start_time < until).count()
+    assert expected
+    rows = list(csv.DictReader(io.StringIO(client.get('/shows/export.csv?' + query).get_data(as_text=True))))
+    assert len(rows) == expected
+    assert all(since.isoformat() <= row['start_time'] < until.isoformat() for row in rows)
+    lines = client.get('/shows/export.ndjson?' + query).get_data(as_text=True).splitlines()
+    assert [json.loads(line)['id'] for line in lines] == [int(row['id']) for row in rows]
+
+
+def test_export_refuses_a_malformed_date(client):
+    assert client.get('/shows/export.csv?from=yesterday').status_code == 400
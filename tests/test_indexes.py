@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import func, select
+
+from models import Artist, Venue, db
+
+
+def plan(application, statement, parameters=()):
+    # SQLite's EXPLAIN QUERY PLAN, one line per step
+    with application.app_context():
+        rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return '\n'.join(row[-1] for row in rows)
+
+
+def plans(application, statements, url):
+    # the statements a page runs that read the Show table, with their plans
+    client = application.test_client()
+    with statements(application) as executed:
+        assert client.get(url).status_code == 200
+    return [(statement, plan(application, statement, parameters)) for statement, parameters in executed
+            if 'FROM "Show"' in statement]
+
+
+@pytest.fixture
+def app(seeded):
+    return seeded(venues=200, artists=300, shows=5000)
+
+
+@pytest.mark.parametrize('url, index', [
+    ('/venues/1', 'ix_show_venue_id_start_time'),
+    ('/artists/1', 'ix_show_artist_id_start_time'),
+])
+def test_detail_pages_read_the_shows_of_their_owner_by_index(app, statements, url, index):
+    found = plans(app, statements, url)
+    assert found
+    for _, steps in found:
+        assert 'USING INDEX %s' % index in steps or 'USING COVERING INDEX %s' % index in steps
+
+
+def test_shows_pages_through_the_start_time_index(app, statements):
+    found = plans(app, statements, '/shows')
+    listing = [steps for statement, steps in found if 'JOIN "Venue"' in statement]
+    assert listing
+    for steps in listing:
+        assert 'INDEX ix_show_start_time_id' in steps
+        assert 'USE TEMP B-TREE' not in steps
+
+
+@pytest.mark.parametrize('model, index', [(Venue, 'ix_venue_lower_name'), (Artist, 'ix_artist_lower_name')])
+def test_names_are_looked_up_case_insensitively_by_index(app, model, index):
+    query = select(model.id).where(func.lower(model.name) == 'the musical hop')
+    with app.app_context():
+        compiled = query.compile(db.engine)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    assert 'INDEX %s' % index in plan(app, str(compiled), params)
@@ -0,0 +1,22 @@
+import threading
+
+from app import create_app, parallelReads
+from bench import benchConfig
+
+
+def threads(application):
+    with application.test_request_context('/'):
+        return parallelReads.gather(threading.get_ident, threading.get_ident)
+
+
+def test_reads_run_side_by_side_on_a_database_file(app):
+    first, second = threads(app)
+    assert first != second
+
+
+def test_reads_run_one_after_another_on_an_in_memory_database(tmp_path):
+    # one connection, shared by the threads, would run them at the same time
+    application = create_app(benchConfig('sqlite://', DEBUG=False, SQLALCHEMY_REPLICA_URIS=[],
+                                         LOG_FILE=str(tmp_path / 'error.log')))
+    first, second = threads(application)
+    assert first == second == threading.get_ident()
@@ -0,0 +1,102 @@
+import shutil
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from bench import benchConfig
+from models import Venue, db
+
+
+def databases(seeded, tmp_path):
+    # a primary and a replica, both copies of a seeded database
+    source = seeded().config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):]
+    urls = []
+    for name in ('primary', 'replica'):
+        shutil.copy(source, tmp_path / ('%s.sqlite' % name))
+        urls.append('sqlite:///%s' % (tmp_path / ('%s.sqlite' % name)))
+    return urls
+
+
+def routed(primary, replica, tmp_path):
+    return create_app(benchConfig(primary, DEBUG=False, CACHE_TYPE='null', SQLALCHEMY_REPLICA_URIS=[replica],
+                                  LOG_FILE=str(tmp_path / 'error.log')))
+
+
+class Engines:
+    """The statements each engine of the app ran, by 'primary' or 'replica'."""
+
+    def __init__(self, application):
+        with application.app_context():
+            self.engines = {'primary': db.engine, 'replica': application.extensions['replicas'].engines[0]}
+        self.statements = {name: [] for name in self.engines}
+        for name, engine in self.engines.items():
+            event.listen(engine, 'before_cursor_execute', self.listener(name))
+
+    def listener(self, name):
+        def record(connection, cursor, statement, *args):
+            if statement != 'SELECT 1':
+                self.statements[name].append(statement)
+        return record
+
+    def reset(self):
+        for statements in self.statements.values():
+            del statements[:]
+
+
+@pytest.fixture
+def routing(seeded, tmp_path):
+    application = routed(*databases(seeded, tmp_path), tmp_path)
+    return application, Engines(application)
+
+
+def venueForm(name):
+    return {'name': name, 'city': 'San Francisco', 'state': 'CA', 'address': '1 Test Street',
+            'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/test', 'phone': '',
+            'image_link': '', 'website_link': '', 'seeking_description': ''}
+
+
+def test_read_only_views_read_from_the_replica(routing):
+    application, engines = routing
+    assert application.test_client().get('/venues').status_code == 200
+    assert engines.statements['replica']
+    assert not engines.statements['primary']
+
+
+def test_writes_go_to_the_primary(routing):
+    application, engines = routing
+    response = application.test_client().post('/venues/create', data=venueForm('Routed Venue'))
+    assert response.status_code == 302
+    assert any(statement.startswith('INSERT') for statement in engines.statements['primary'])
+    assert not engines.statements['replica']
+    with application.app_context():
+        assert Venue.query.filter_by(name='Routed Venue').count() == 1
+        replica = application.extensions['replicas'].engines[0]
+        with replica.connect() as connection:
+            assert not connection.exec_driver_sql(
+                'SELECT id FROM "Venue" WHERE name = ?', ('Routed Venue',)).all()
+
+
+def test_reads_right_after_a_write_go_to_the_primary(routing):
+    application, engines = routing
+    client = application.test_client()
+    client.post('/venues/create', data=venueForm('Sticky Venue'))
+    engines.reset()
+    page = client.get('/venues')
+    assert b'Sticky Venue' in page.data
+    assert engines.statements['primary']
+    assert not engines.statements['replica']
+    # another client has not written
+    application.test_client().get('/venues')
+    assert engines.statements['replica']
+
+
+def test_an_unreachable_replica_is_marked_down_and_reads_fall_back(seeded, tmp_path):
+    primary, _ = databases(seeded, tmp_path)
+    application = routed(primary, 'sqlite:///%s' % (tmp_path / 'missing' / 'replica.sqlite'), tmp_path)
+    engines = Engines(application)
+    assert application.test_client().get('/venues').status_code == 200
+    assert engines.statements['primary']
+    assert not engines.statements['replica']
+    with application.app_context():
+        assert application.extensions['replicas'].stats() == [{'replica': 0, 'up': False}]
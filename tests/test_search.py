@@ -0,0 +1,49 @@
+import re
+
+import pytest
+
+from app import searchEntities
+from models import Artist, Show, Venue, db
+
+endpoints = [('/venues/search', Venue, 'venues'), ('/artists/search', Artist, 'artists')]
+
+
+@pytest.mark.parametrize('url, model, kind', endpoints)
+def test_search_runs_one_statement_per_page_for_any_number_of_matches(seeded, statements, url, model, kind):
+    counts = []
+    for venues, artists in ((20, 30), (400, 600)):
+        application = seeded(venues=venues, artists=artists)
+        client = application.test_client()
+        client.post(url, data={'search_term': 'a'})
+        with statements(application) as executed:
+            response = client.post(url, data={'search_term': 'a'})
+        assert response.status_code == 200
+        counts.append(len(executed))
+    # the rows of the page, with their upcoming counts
+    assert counts == [1, 1]
+
+
+@pytest.mark.parametrize('url, model, kind', endpoints)
+def test_search_pages_are_capped_and_disjoint(seeded, statements, url, model, kind):
+    application = seeded(venues=400, artists=600)
+    client = application.test_client()
+    pageSize = application.config['SEARCH_PAGE_SIZE']
+    pages = [client.post(url, data={'search_term': 'a'}).get_data(as_text=True)]
+    with statements(application) as executed:
+        pages.append(client.post(url, data={'search_term': 'a', 'page': 2}).get_data(as_text=True))
+    assert len(executed) == 1
+    ids = [re.findall(r'href="/(?:venues|artists)/(\d+)"', page) for page in pages]
+    assert len(ids[0]) == len(ids[1]) == pageSize
+    assert not set(ids[0]) & set(ids[1])
+
+
+@pytest.mark.parametrize('url, model, kind', endpoints)
+def test_search_reports_the_upcoming_shows_of_each_match(app, url, model, kind):
+    key = Show.venue_id if model is Venue else Show.artist_id
+    with app.test_request_context(url):
+        results = searchEntities(model, kind, 'a', 1)
+        assert results['data']
+        for row in results['data']:
+            owner = db.session.get(model, row['id'])
+            upcoming = Show.query.filter(key == owner.id, Show.start_time >= owner.counts_as_of).count()
+            assert row['num_upcoming_shows'] == upcoming
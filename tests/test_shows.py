@@ -0,0 +1,23 @@
+from models import Show
+
+
+def listed(app):
+    with app.app_context():
+        return Show.query.count()
+
+
+def test_show_form_refuses_an_unknown_venue_or_artist(app, client):
+    before = listed(app)
+    for ids in ({'venue_id': 99999, 'artist_id': 1}, {'venue_id': 1, 'artist_id': 99999}):
+        response = client.post('/shows/create', data=dict(ids, start_time='2091-01-01 20:00:00'),
+                               follow_redirects=True)
+        assert b'could not be listed: there is no' in response.data
+    assert listed(app) == before
+
+
+def test_show_form_refuses_a_missing_or_malformed_start_time(app, client):
+    before = listed(app)
+    for start in ('', '2091-01-01 20:00'):
+        response = client.post('/shows/create', data={'venue_id': 1, 'artist_id': 1, 'start_time': start})
+        assert response.status_code == 400
+    assert listed(app) == before
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from app import showCounters
+from models import Show, db
+
+
+def test_venues_runs_the_same_statements_for_any_number_of_venues(seeded, statements):
+    counts = []
+    for venues in (20, 400):
+        application = seeded(venues=venues)
+        with statements(application) as executed:
+            response = application.test_client().get('/venues')
+        assert response.status_code == 200
+        counts.append(len(executed))
+    # the page validator and the grouped listing
+    assert counts == [2, 2]
+
+
+def test_venues_filtered_by_genre_runs_one_listing_query(app, client, statements):
+    with statements(app) as executed:
+        response = client.get('/venues?genre=Jazz')
+    assert response.status_code == 200
+    assert len(executed) == 2
+
+
+def test_upcoming_counts_follow_new_shows(app, client):
+    response = client.post('/shows/create', data={'venue_id': 1, 'artist_id': 1,
+                                                  'start_time': '2090-01-01 20:00:00'})
+    assert response.status_code == 302
+    with app.app_context():
+        assert Show.query.filter_by(start_time=datetime(2090, 1, 1, 20)).count() == 1
+        assert showCounters.mismatches(db.session.connection()) == []
+
+
+def test_deleting_a_venue_takes_its_shows_off_the_artists_counts(seeded):
+    application = seeded(venues=10, artists=10, shows=200)
+    with application.app_context():
+        venue = db.session.query(Show.venue_id).first()[0]
+    assert application.test_client().delete('/venues/%d' % venue).status_code == 302
+    with application.app_context():
+        assert Show.query.filter_by(venue_id=venue).count() == 0
+        assert showCounters.mismatches(db.session.connection()) == []
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+
+from flask import (before_render_template, g, has_request_context, request, request_finished,
+                   request_started, signals_available, template_rendered)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Opt-in per-request instrumentation (TIMING=1). While a request is served,
+# every statement on any engine (primary or replica) is counted and timed,
+# and so is template rendering. The totals go out as a Server-Timing header
+# and one JSON log line per request. A request that ran more than
+# TIMING_EXPLAIN_QUERIES statements also logs the plan of each distinct
+# statement, which is what an N+1 regression looks like.
+#
+# Streamed responses are measured up to the point the body starts.
+
+EXPLAIN = {
+    'postgresql': 'EXPLAIN ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+
+class Timing:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.dbTime = 0.0
+        self.renderTime = 0.0
+        self.renderStarted = None
+        # SQL text -> count, total and slowest time, and what to EXPLAIN it with
+        self.statements = {}
+        # parallel.py runs some of a request's queries on other threads
+        self.lock = threading.Lock()
+
+    def record(self, connection, statement, parameters, executemany, elapsed):
+        with self.lock:
+            self.queries += 1
+            self.dbTime += elapsed
+            entry = self.statements.get(statement)
+            if entry is None:
+                entry = self.statements[statement] = {
+                    'count': 0, 'total': 0.0, 'slowest': 0.0, 'engine': connection.engine,
+                    'parameters': None if executemany else parameters
+                }
+            entry['count'] += 1
+            entry['total'] += elapsed
+            entry['slowest'] = max(entry['slowest'], elapsed)
+
+    def serverTiming(self, total):
+        return 'db;dur=%.2f;desc="%d queries", render;dur=%.2f, total;dur=%.2f' % (
+            self.dbTime * 1000, self.queries, self.renderTime * 1000, total * 1000)
+
+
+def current():
+    return g.get('timing') if has_request_context() else None
+
+
+def beforeExecute(connection, cursor, statement, parameters, context, executemany):
+    if current() is not None:
+        connection.info.setdefault('timing_started', []).append(time.perf_counter())
+
+
+def afterExecute(connection, cursor, statement, parameters, context, executemany):
+    timing = current()
+    started = connection.info.get('timing_started')
+    if timing is not None and started:
+        timing.record(connection, statement, parameters, executemany, time.perf_counter() - started.pop())
+
+
+def failedExecute(context):
+    started = context.connection.info.get('timing_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+class RequestTiming:
+
+    def init_app(self, app):
+        if not app.config.get('TIMING'):
+            return
+        if not signals_available:
+            app.logger.warning('TIMING needs blinker for the Flask signals; instrumentation is off')
+            return
+        for name, listener in (('before_cursor_execute', beforeExecute),
+                               ('after_cursor_execute', afterExecute),
+                               ('handle_error', failedExecute)):
+            if not event.contains(Engine, name, listener):
+                event.listen(Engine, name, listener)
+        request_started.connect(self.requestStarted, app)
+        request_finished.connect(self.requestFinished, app)
+        before_render_template.connect(self.templateStarted, app)
+        template_rendered.connect(self.templateRendered, app)
+
+    def requestStarted(self, app, **extra):
+        g.timing = Timing()
+
+    def templateStarted(self, app, template, context, **extra):
+        timing = current()
+        if timing is not None:
+            timing.renderStarted = time.perf_counter()
+
+    def templateRendered(self, app, template, context, **extra):
+        timing = current()
+        if timing is not None and timing.renderStarted is not None:
+            timing.renderTime += time.perf_counter() - timing.renderStarted
+            timing.renderStarted = None
+
+    def requestFinished(self, app, response, **extra):
+        timing = g.pop('timing', None)
+        if timing is None:
+            return
+        total = time.perf_counter() - timing.started
+        response.headers['Server-Timing'] = timing.serverTiming(total)
+        slowest = sorted(timing.statements.items(), key=lambda item: item[1]['slowest'], reverse=True)
+        app.logger.info('timing %s', json.dumps({
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(timing.dbTime * 1000, 2),
+            'queries': timing.queries,
+            'render_ms': round(timing.renderTime * 1000, 2),
+            'slowest': [{'ms': round(entry['slowest'] * 1000, 2), 'count': entry['count'], 'sql': statement}
+                        for statement, entry in slowest[:app.config.get('TIMING_SLOWEST', 3)]]
+        }))
+        explainAfter = app.config.get('TIMING_EXPLAIN_QUERIES', 0)
+        if explainAfter and timing.queries > explainAfter:
+            self.explain(app, timing)
+
+    def explain(self, app, timing):
+        for statement, entry in timing.statements.items():
+            engine = entry['engine']
+            prefix = EXPLAIN.get(engine.dialect.name)
+            if prefix is None or entry['parameters'] is None or not statement.lstrip().upper().startswith('SELECT'):
+                continue
+            try:
+                with engine.connect() as connection:
+                    rows = connection.exec_driver_sql(prefix + statement, entry['parameters']).all()
+                plan = '\n'.join(' | '.join(str(value) for value in row) for row in rows)
+            except Exception as e:
+                plan = 'EXPLAIN failed: %s' % e
+            app.logger.info('plan (%d queries in %s; ran %d times)\n%s\n%s',
+                            timing.queries, request.path, entry['count'], statement, plan)
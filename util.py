@@ -1,56 +1,64 @@
-import json
+import csv
+import io
+from datetime import datetime
 
-def reduceVenues(acc, item):
-    findItem = list(filter(lambda x: x['state'] == item['state'] and x['city'] == item['city'] , acc))
-    if(len(findItem) == 0):
-        newItem = {
-            'state': item['state'],
-            'city': item['city'],
-            'venues': [item]
-        }
-        acc.append(newItem)
-    else:
-        findItem[0]['venues'].append(item)
-    return acc
+def groupVenues(venues):
+    # single pass keyed on (state, city); dicts keep insertion order so the
+    # areas are listed in the order they are first seen
+    areas = {}
+    for item in venues:
+        key = (item['state'], item['city'])
+        area = areas.get(key)
+        if area is None:
+            area = areas[key] = {
+                'state': item['state'],
+                'city': item['city'],
+                'venues': []
+            }
+        area['venues'].append(item)
+    return list(areas.values())
 
-def createVenueEntity(data: dict, venue):
+def createVenueEntity(data: dict, venue, genres):
     venue.name = data['name']
     venue.city = data['city']
     venue.state = data['state']
     venue.address = data['address']
     venue.phone = data['phone']
     venue.image_link = data['image_link']
-    venue.genres = json.dumps(data['genres'])
+    venue.genres = genres
     venue.facebook_link = data['facebook_link']
     venue.website = data['website_link']
     venue.seeking_talent = data['seeking_talent']
     venue.seeking_description = data['seeking_description']
+    # set even when only the genres changed, which leaves the row itself alone
+    venue.updated_at = datetime.now()
     return venue
 
-def createArtistEntity(data: dict, artist):
+def createArtistEntity(data: dict, artist, genres):
     artist.name = data['name']
     artist.city = data['city']
     artist.state = data['state']
     artist.phone = data['phone']
     artist.image_link = data['image_link']
-    artist.genres = json.dumps(data['genres'])
+    artist.genres = genres
     artist.facebook_link = data['facebook_link']
     artist.website = data['website_link']
     artist.seeking_venue = data['seeking_venue']
     artist.seeking_description = data['seeking_description']
+    artist.updated_at = datetime.now()
     return artist
 
 
 def createShowVenue(shows):
     result = []
     for show in shows:
-        artist = show.Show.artist
+        artist = show.artist
         result.append(
             {
                 "artist_id": artist.id,
                 "artist_name": artist.name,
                 "artist_image_link": artist.image_link,
-                "start_time": show.Show.start_time.strftime("%b %d %Y ")
+                "start_time": show.start_time
             }
         )
     return result
@@ -58,13 +66,45 @@ def createShowVenue(shows):
 def createShowArtist(shows):
     result = []
     for show in shows:
-        venue = show.Show.venue
+        venue = show.venue
         result.append(
             {
                 "venue_id": venue.id,
                 "venue_name": venue.name,
                 "venue_image_link": venue.image_link,
-                "start_time": show.Show.start_time.strftime("%b %d %Y ")
+                "start_time": show.start_time
             }
         )
-    return result
\ No newline at end of file
+    return result
+
+def encodeCursor(start_time, id):
+    return '%s_%d' % (start_time.isoformat(), id)
+
+def decodeCursor(value):
+    # inverse of encodeCursor; raises ValueError on anything malformed
+    start_time, _, id = value.rpartition('_')
+    return datetime.fromisoformat(start_time), int(id)
+
+def csvChunks(header, rows, size=1000):
+    # CSV text of `rows`, yielded `size` rows at a time
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def ndjsonChunks(rows, dumps, size=1000):
+    # one JSON document per line, `size` lines per chunk; `dumps` returns bytes
+    lines = []
+    for row in rows:
+        lines.append(dumps(row))
+        if len(lines) == size:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'